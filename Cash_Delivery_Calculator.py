@@ -1,3 +1,6 @@
+import time
+startup_started = time.perf_counter()  # Start of the time-to-first-frame measurement
+
 try:
     import tkinter as tk
 except ImportError:
@@ -6,9 +9,19 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "tk"])
     import tkinter as tk
 
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from itertools import product
-from math import ceil
+from math import ceil, gcd, exp
+from functools import lru_cache
+from array import array
+from bisect import bisect_left, bisect_right
+import csv
+import json
+import heapq
+import mmap
+import os
+import random
+import struct
 
 # Container capacities in volume - organized by size categories
 containers = {
@@ -37,33 +50,155 @@ containers = {
     }
 }
 
+# Extra containers can be added without code changes through an external
+# catalog file with the same {category: {name: capacity}} layout
+container_catalog_file = "containers.json"
+
+def load_container_catalog(path=container_catalog_file):
+    """Merge containers from the catalog file (if any) into the built-in set"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r") as f:
+            catalog = json.load(f)
+        for category, items in catalog.items():
+            containers.setdefault(category, {}).update({name: int(capacity) for name, capacity in items.items()})
+    except Exception:
+        pass  # Keep the built-in containers if the catalog can't be read
+
+load_container_catalog()
+
 # Flatten containers for backward compatibility
 flat_containers = {}
 for category, items in containers.items():
     flat_containers.update(items)
 
-# Denomination labels using proper Unicode characters - FIXED CURRENCY SYMBOLS
-label_map = {
-    "10000": "$100",
-    "5000": "$50",
-    "2000": "$20",
-    "1000": "$10",
-    "1000000": "¥10,000",  # Fixed: Using proper Yen symbol
-    "500000": "¥5,000",   # Fixed: Using proper Yen symbol
-    "100000": "¥1,000",   # Fixed: Using proper Yen symbol
-    "10000e": "€100",     # Fixed: Using proper Euro symbol
-    "5000e": "€50",       # Fixed: Using proper Euro symbol
-    "2000e": "€20"        # Fixed: Using proper Euro symbol
+def build_container_index(catalog):
+    """
+    Build the container index: parallel capacity/name lists sorted by
+    capacity, for the whole catalog and for each category
+    """
+    def view(items):
+        entries = sorted((capacity, name) for name, capacity in items)
+        return {"capacities": [c for c, _ in entries], "names": [n for _, n in entries]}
+
+    index = view((name, capacity) for items in catalog.values() for name, capacity in items.items())
+    index["categories"] = {category: view(items.items()) for category, items in catalog.items()}
+    return index
+
+container_index = build_container_index(containers)
+
+def _container_view(category=None):
+    """The whole index, or one category's view of it"""
+    return container_index if category is None else container_index["categories"][category]
+
+def smallest_container_for(volume, category=None):
+    """Smallest container that holds the volume on its own: (name, capacity) or None"""
+    view = _container_view(category)
+    i = bisect_left(view["capacities"], volume)
+    if i == len(view["capacities"]):
+        return None
+    return view["names"][i], view["capacities"][i]
+
+def containers_in_range(low, high, category=None):
+    """All containers with low <= capacity <= high, smallest first: [(name, capacity)]"""
+    view = _container_view(category)
+    i = bisect_left(view["capacities"], low)
+    j = bisect_right(view["capacities"], high)
+    return list(zip(view["names"][i:j], view["capacities"][i:j]))
+
+def cheapest_container_set(volume, k, category=None):
+    """Smallest container type of which k together hold the volume: (name, capacity) or None"""
+    return smallest_container_for(volume / k, category)
+
+def recommend_container(volume, category=None):
+    """
+    Recommend a container for a volume: the fewest containers of one type,
+    then the least wasted space. Returns (name, count) or None.
+    """
+    view = _container_view(category)
+    if not view["capacities"]:
+        return None
+    count = max(1, ceil(volume / view["capacities"][-1]))
+    name, _ = cheapest_container_set(volume, count, category)
+    return name, count
+
+# Currencies: pack values in cents (highest first), the symbol used in
+# labels, and the pack geometry used for volume. key_suffix keeps a
+# currency's keys in all_denom_vars and config.json apart from other
+# currencies with the same pack values; it defaults to the lowercased
+# currency name. Extra currencies (or overrides) can be added without code
+# changes through an external catalog file with the same {name: {...}} layout.
+currencies = {
+    "Dollars": {"symbol": "$", "denominations": [10000, 5000, 2000, 1000], "key_suffix": ""},
+    "Euros": {"symbol": "€", "denominations": [10000, 5000, 2000], "key_suffix": "e"},
+    "Yen": {"symbol": "¥", "denominations": [1000000, 500000, 100000], "key_suffix": ""}
 }
+currency_catalog_file = "currencies.json"
+DEFAULT_PACK_SIZE = 100  # Bills per pack
+DEFAULT_BILL_VOLUME = 0.05  # Volume of one bill (0.1 x 0.5)
 
-def calculate_volume(denominations, combo):
+def load_currency_catalog(path=currency_catalog_file):
+    """Merge currencies from the catalog file (if any) into the built-in set"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        for name, spec in catalog.items():
+            currencies.setdefault(name, {}).update(spec)
+    except Exception:
+        pass  # Keep the built-in currencies if the catalog can't be read
+
+def build_currency_registry(catalog):
+    """
+    Precompute what the solver and the UI need per currency: pack values
+    highest first, their GCD, denomination keys and labels, and the volume
+    of one pack. Currencies that are malformed or whose keys would clash
+    with an earlier currency are left out.
+    """
+    registry = {}
+    taken = set()
+    for name, spec in catalog.items():
+        try:
+            values = sorted({int(value) for value in spec["denominations"]}, reverse=True)
+            suffix = spec.get("key_suffix", name.lower())
+            keys = {value: f"{value}{suffix}" for value in values}
+            if not values or values[-1] <= 0 or taken & set(keys.values()):
+                continue
+            unit = 0
+            for value in values:
+                unit = gcd(unit, value)
+            labels = {}
+            for value in values:
+                whole = value // 100 if value % 100 == 0 else value / 100
+                labels[keys[value]] = spec.get("labels", {}).get(str(value), f"{spec.get('symbol', '')}{whole:,}")
+            registry[name] = {
+                "denominations": values,
+                "unit": unit,
+                "keys": keys,
+                "labels": labels,
+                "pack_volume": float(spec.get("pack_size", DEFAULT_PACK_SIZE)) * float(spec.get("bill_volume", DEFAULT_BILL_VOLUME))
+            }
+            taken.update(keys.values())
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return registry
+
+load_currency_catalog()
+currency_registry = build_currency_registry(currencies)
+
+# Lookup tables derived from the registry
+currency_denoms = {name: info["denominations"] for name, info in currency_registry.items()}  # Pack values per currency, highest first
+label_map = {key: label for info in currency_registry.values() for key, label in info["labels"].items()}
+denom_values = {key: value for info in currency_registry.values() for value, key in info["keys"].items()}
+
+def calculate_volume(denominations, combo, currency=None):
     """Calculate total volume needed for the given denomination combination"""
-    volume = 0
-    for denom, count in zip(denominations, combo):
-        # Each pack contains 100 bills, so total bills = count * 100
-        total_bills = count * 100
-        volume += (total_bills * 0.1) * 0.5
-    return volume
+    # Every pack has the same size (100 bills by default), whatever its denomination
+    info = currency_registry.get(currency)
+    pack_volume = info["pack_volume"] if info else DEFAULT_PACK_SIZE * DEFAULT_BILL_VOLUME
+    return sum(combo) * pack_volume
 
 def calculate_balance_score(denominations, max_counts, combo):
     """
@@ -106,7 +241,7 @@ def create_sorted_counts_string(denominations, combo, currency):
     denom_data = []
     for d, c in zip(denominations, combo):
         if c > 0:  # Only include non-zero counts
-            label = label_map.get(str(d) + ('e' if currency == 'Euros' else ''), str(d))
+            label = label_map.get(denom_key(currency, d), str(d))
             denom_data.append((d, c, label))
     
     # Sort by denomination value (highest first)
@@ -116,173 +251,1188 @@ def create_sorted_counts_string(denominations, combo, currency):
     counts_str = ", ".join(f"{label}:{count}" for _, count, label in denom_data)
     return counts_str
 
-def greedy_search(denominations, max_counts, desired_amount, max_results=30):
-    """Original greedy search algorithm"""
+# Precomputed change-making tables (unlimited stock)
+# One file per currency, built offline with --build-tables or on first use,
+# and memory-mapped so lookups never touch the rest of the table. Tables are
+# written to a temporary file and renamed into place, so another planner
+# never maps a half-written table, and a rebuild never truncates a file
+# someone still has mapped.
+change_table_dir = "change_tables"
+CHANGE_TABLE_UNITS = 5000  # Amounts covered: 0 .. 5000 x GCD of the currency's packs
+CHANGE_TABLE_MAGIC = b"CDCT"
+CHANGE_TABLE_HEADER = struct.Struct("<4sHHI")  # magic, version, denominations, units
+CHANGE_TABLE_UNREACHABLE = 0xFFFFFFFF
+
+_change_tables = {}  # currency -> (mmap, denominations, unit, units, row struct)
+
+def change_table_path(currency):
+    """Location of the change-making table file for a currency"""
+    return os.path.join(change_table_dir, f"{currency.lower()}.bin")
+
+def build_change_table(currency, units=CHANGE_TABLE_UNITS):
+    """
+    Build the change-making table for a currency and write it to disk.
+    Each row holds the minimum pack count for an amount followed by the
+    canonical split (highest denominations preferred on ties).
+    """
+    denominations = currency_registry[currency]["denominations"]
+    unit = currency_registry[currency]["unit"]
+    steps = [d // unit for d in denominations]
+
+    # Unbounded coin-change DP over amount / unit
+    best = [0] + [CHANGE_TABLE_UNREACHABLE] * units
+    choice = [-1] * (units + 1)
+    for u in range(1, units + 1):
+        for i, step in enumerate(steps):
+            if step <= u and best[u - step] != CHANGE_TABLE_UNREACHABLE and best[u - step] + 1 < best[u]:
+                best[u] = best[u - step] + 1
+                choice[u] = i
+
+    row = struct.Struct(f"<{len(denominations) + 1}I")
+    os.makedirs(change_table_dir, exist_ok=True)
+    path = change_table_path(currency)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(CHANGE_TABLE_HEADER.pack(CHANGE_TABLE_MAGIC, 1, len(denominations), units))
+            f.write(struct.pack(f"<{len(denominations)}I", *denominations))
+            for u in range(units + 1):
+                split = [0] * len(denominations)
+                if best[u] != CHANGE_TABLE_UNREACHABLE:
+                    rest = u
+                    while rest:
+                        split[choice[rest]] += 1
+                        rest -= steps[choice[rest]]
+                f.write(row.pack(best[u], *split))
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def change_table_units(data, denominations):
+    """
+    The number of amount steps a mapped table covers, or None if it is not a
+    complete version-1 table for these denominations (the file size has to
+    match its header exactly)
+    """
+    if len(data) < CHANGE_TABLE_HEADER.size:
+        return None
+    magic, version, count, units = CHANGE_TABLE_HEADER.unpack_from(data, 0)
+    if magic != CHANGE_TABLE_MAGIC or version != 1 or count != len(denominations):
+        return None
+    row_size = 4 * (count + 1)
+    if len(data) != CHANGE_TABLE_HEADER.size + 4 * count + (units + 1) * row_size:
+        return None
+    if list(struct.unpack_from(f"<{count}I", data, CHANGE_TABLE_HEADER.size)) != denominations:
+        return None
+    return units
+
+def get_change_table(currency):
+    """Memory-map a currency's change table, building it the first time it is needed"""
+    if currency in _change_tables:
+        return _change_tables[currency]
+    denominations = currency_registry[currency]["denominations"]
+    path = change_table_path(currency)
+    table = None
+    for attempt in range(2):
+        try:
+            if attempt or not os.path.exists(path):
+                build_change_table(currency)
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            units = change_table_units(data, denominations)
+            if units is not None:
+                table = (data, denominations, currency_registry[currency]["unit"], units,
+                         struct.Struct(f"<{len(denominations) + 1}I"))
+                break
+            data.close()  # Stale (older denomination set) or damaged table - rebuild it
+        except (OSError, ValueError, struct.error):
+            if attempt:
+                break  # No usable table; callers fall back to plain search
+            # Unreadable (an empty file can't even be mapped): rebuild it
+    _change_tables[currency] = table
+    return table
+
+def lookup_change(currency, amount):
+    """
+    Look up the unlimited-stock answer for an amount.
+    Returns None when the table does not cover the amount, otherwise
+    (min_packs, split) with split aligned to currency_denoms[currency].
+    min_packs is None when no combination of packs can make the amount.
+    """
+    if currency not in currency_denoms or amount < 0:
+        return None
+    table = get_change_table(currency)
+    if table is None:
+        return None
+    data, denominations, unit, units, row = table
+    if amount % unit:
+        return (None, ())
+    if amount // unit > units:
+        return None
+    offset = CHANGE_TABLE_HEADER.size + 4 * len(denominations) + row.size * (amount // unit)
+    values = row.unpack_from(data, offset)
+    if values[0] == CHANGE_TABLE_UNREACHABLE:
+        return (None, ())
+    return (values[0], tuple(values[1:]))
+
+def exact_change_combo(currency, amount, denominations, max_counts):
+    """
+    Return the minimum-pack combo from the change table as a search result
+    if the available stock allows it, otherwise None.
+    """
+    change = lookup_change(currency, amount)
+    if change is None or change[0] is None:
+        return None
+    split = dict(zip(currency_denoms[currency], change[1]))
+    if any(c and d not in denominations for d, c in split.items()):
+        return None
+    combo = tuple(split[d] for d in denominations)
+    if any(c > m for c, m in zip(combo, max_counts)):
+        return None
+    return (combo, change[0], amount)
+
+# Diverse results
+# Neighbouring leaves of the search tree differ by a pack or two, so the
+# first 30/50 combos a search finds tend to be near-copies of each other.
+# A diversity filter keeps a combo only if it is at least min_distance from
+# every combo kept so far: L1 distance counts the packs that change, Hamming
+# the denominations whose count changes. The searches consult it as each
+# combo is found, so the result slots fill with real alternatives at a cost
+# of one comparison per kept combo. The filter only rejects finished combos,
+# so a DFS that has to walk past thousands of near-copies gets a time budget.
+# The ranked top lists (anytime and priority_search) instead let a better
+# combo displace the kept ones too close to it.
+DIVERSE_SEARCH_BUDGET = 1.0  # Seconds a filtered DFS may spend filling its result slots
+
+def combo_distance(a, b, metric="l1"):
+    """Distance between two combos over the same denominations"""
+    if metric == "hamming":
+        return sum(x != y for x, y in zip(a, b))
+    return sum(abs(x - y) for x, y in zip(a, b))
+
+def diversity_filter(min_distance, metric="l1"):
+    """
+    Return accept(combo): True, and remember the combo, when it is at least
+    min_distance from every combo accepted so far
+    """
+    kept = []
+    def accept(combo):
+        for other in kept:
+            if combo_distance(combo, other, metric) < min_distance:
+                return False
+        kept.append(combo)
+        return True
+    return accept
+
+def diverse_deadline(deadline, stats=None):
+    """
+    Return stop() for a filtered DFS: True once time.time() passes deadline
+    (wall clock, so solver workers can share it), which also sets
+    stats["diversity_cut"]
+    """
+    state = {"calls": 0, "stopped": False}
+
+    def stop():
+        state["calls"] += 1
+        if not state["stopped"] and state["calls"] % 1024 == 0 and time.time() > deadline:
+            state["stopped"] = True
+            if stats is not None:
+                stats["diversity_cut"] = True
+        return state["stopped"]
+    return stop
+
+def make_room(best, entry, min_distance, metric="l1"):
+    """
+    Let a ranked top list (a heap of (negated rank key, combo), worst on top)
+    take entry when its combos must be min_distance apart: the kept combos
+    too close to it are removed and returned, or None is returned (and
+    nothing removed) if one of them ranks at least as well as entry
+    """
+    close = [other for other in best if combo_distance(other[1], entry[1], metric) < min_distance]
+    if any(other[0] >= entry[0] for other in close):
+        return None
+    if close:
+        best[:] = [other for other in best if other not in close]
+        heapq.heapify(best)
+    return [combo for _, combo in close]
+
+def greedy_count_order(max_count, remaining, denom):
+    """Counts the greedy search tries for one denomination, most first"""
+    return reversed(range(min(max_count, remaining // denom + 1) + 1))
+
+def greedy_search(denominations, max_counts, desired_amount, max_results=30, full_blocks=False, prefix=(), stop=None,
+                  accept=None):
+    """
+    Original greedy search algorithm.
+    prefix fixes the counts of the first denominations (a parallel work unit),
+    stop, if given, is polled to abandon the search early, and accept, if
+    given, decides whether a found combo takes a result slot (a diversity filter).
+    """
     results = []
     def recurse(index, current_combo, current_total, total_packs):
         if len(results) >= max_results:
             return
         if current_total > desired_amount:
             return
+        if stop is not None and stop():
+            return
         if index == len(denominations):
             if current_total == desired_amount:
-                if not full_blocks_only.get() or total_packs % 30 == 0:
-                    results.append((tuple(current_combo), total_packs, current_total))
+                if not full_blocks or total_packs % 30 == 0:
+                    combo = tuple(current_combo)
+                    if accept is None or accept(combo):
+                        results.append((combo, total_packs, current_total))
             return
         denom = denominations[index]
-        for count in reversed(range(min(max_counts[index], (desired_amount - current_total) // denom + 1) + 1)):
+        for count in greedy_count_order(max_counts[index], desired_amount - current_total, denom):
             recurse(index + 1, current_combo + [count], current_total + denom * count, total_packs + count)
-    recurse(0, [], 0, 0)
+    recurse(len(prefix), list(prefix), sum(d * c for d, c in zip(denominations, prefix)), sum(prefix))
     return results
 
-def balanced_search(denominations, max_counts, desired_amount, max_results=50):
-    """
-    Enhanced search algorithm that prioritizes balanced distribution
-    and using denominations where you have abundance.
-    """
+def balanced_count_order(max_count, max_possible):
+    """Counts the balanced search tries for one denomination, in the order it tries them"""
+    # For balanced approach, try different strategies
+    ranges_to_try = []
+    
+    # Strategy 1: Try using more of abundant denominations
+    if max_count >= 5:  # If we have plenty
+        # Prioritize using a good chunk of abundant denominations
+        preferred_usage = min(max_count // 2, max_possible)
+        ranges_to_try.append(range(max(0, preferred_usage - 2), min(preferred_usage + 3, max_possible + 1)))
+    
+    # Strategy 2: Standard range but prioritize middle values for balance
+    full_range = list(range(max_possible + 1))
+    # Sort to try middle values first for better balance
+    middle = len(full_range) // 2
+    sorted_range = []
+    for i in range(len(full_range)):
+        if i % 2 == 0:
+            idx = middle + i // 2
+        else:
+            idx = middle - (i + 1) // 2
+        if 0 <= idx < len(full_range):
+            sorted_range.append(full_range[idx])
+    ranges_to_try.append(sorted_range)
+    
+    # Try all strategies
+    order = []
+    tried_counts = set()
+    for range_strategy in ranges_to_try:
+        for count in range_strategy:
+            if count not in tried_counts:
+                tried_counts.add(count)
+                order.append(count)
+    return order
+
+def balanced_candidates(denominations, max_counts, desired_amount, limit, full_blocks=False, prefix=(), stop=None,
+                        accept=None):
+    """Collect up to limit unranked combos in balanced search order (prefix/stop/accept as in greedy_search)"""
     results = []
     
     def recurse(index, current_combo, current_total, total_packs):
-        if len(results) >= max_results * 2:  # Generate more results for sorting
+        if len(results) >= limit:
             return
         if current_total > desired_amount:
             return
+        if stop is not None and stop():
+            return
         if index == len(denominations):
             if current_total == desired_amount:
-                if not full_blocks_only.get() or total_packs % 30 == 0:
-                    results.append((tuple(current_combo), total_packs, current_total))
+                if not full_blocks or total_packs % 30 == 0:
+                    combo = tuple(current_combo)
+                    if accept is None or accept(combo):
+                        results.append((combo, total_packs, current_total))
             return
         
         denom = denominations[index]
         max_possible = min(max_counts[index], (desired_amount - current_total) // denom)
-        
-        # For balanced approach, try different strategies
-        ranges_to_try = []
-        
-        # Strategy 1: Try using more of abundant denominations
-        if max_counts[index] >= 5:  # If we have plenty
-            # Prioritize using a good chunk of abundant denominations
-            preferred_usage = min(max_counts[index] // 2, max_possible)
-            ranges_to_try.append(range(max(0, preferred_usage - 2), min(preferred_usage + 3, max_possible + 1)))
-        
-        # Strategy 2: Standard range but prioritize middle values for balance
-        full_range = list(range(max_possible + 1))
-        # Sort to try middle values first for better balance
-        middle = len(full_range) // 2
-        sorted_range = []
-        for i in range(len(full_range)):
-            if i % 2 == 0:
-                idx = middle + i // 2
-            else:
-                idx = middle - (i + 1) // 2
-            if 0 <= idx < len(full_range):
-                sorted_range.append(full_range[idx])
-        ranges_to_try.append(sorted_range)
-        
-        # Try all strategies
-        tried_counts = set()
-        for range_strategy in ranges_to_try:
-            for count in range_strategy:
-                if count not in tried_counts:
-                    tried_counts.add(count)
-                    recurse(index + 1, current_combo + [count], current_total + denom * count, total_packs + count)
+        for count in balanced_count_order(max_counts[index], max_possible):
+            recurse(index + 1, current_combo + [count], current_total + denom * count, total_packs + count)
     
-    recurse(0, [], 0, 0)
+    recurse(len(prefix), list(prefix), sum(d * c for d, c in zip(denominations, prefix)), sum(prefix))
+    return results
+
+def rank_balanced(denominations, max_counts, results, max_results):
+    """Sort combos by balance score (lower is better), then packs, and keep the top ones"""
+    scored_results = []
+    for combo, packs, total in results:
+        balance_score = calculate_balance_score(denominations, max_counts, combo)
+        scored_results.append((combo, packs, total, balance_score))
     
-    # Sort results by balance score (lower is better)
-    if results:
-        scored_results = []
-        for combo, packs, total in results:
-            balance_score = calculate_balance_score(denominations, max_counts, combo)
-            scored_results.append((combo, packs, total, balance_score))
-        
-        # Sort by balance score, then by total packs
-        scored_results.sort(key=lambda x: (x[3], x[1]))
-        
-        # Return top results without the score
-        return [(combo, packs, total) for combo, packs, total, score in scored_results[:max_results]]
+    # Sort by balance score, then by total packs
+    scored_results.sort(key=lambda x: (x[3], x[1]))
     
+    # Return top results without the score
+    return [(combo, packs, total) for combo, packs, total, score in scored_results[:max_results]]
+
+def balanced_search(denominations, max_counts, desired_amount, max_results=50, full_blocks=False, accept=None,
+                    stop=None):
+    """
+    Enhanced search algorithm that prioritizes balanced distribution
+    and using denominations where you have abundance.
+    """
+    # Generate more results than needed for sorting
+    results = balanced_candidates(denominations, max_counts, desired_amount, max_results * 2, full_blocks,
+                                  stop=stop, accept=accept)
+    return rank_balanced(denominations, max_counts, results, max_results)
+
+# Parallel search
+# Both searches branch first on the count of the first denomination, so the
+# subtrees under the first one or two levels are independent work units.
+# Most jobs fill their result list within a few thousand nodes, far sooner
+# than a round trip to the pool, so the units are first searched in this
+# process under a node budget. Only the units left when it runs out are
+# handed to a process pool one at a time (idle workers pull the next unit,
+# so uneven subtrees balance out). Everything is merged in serial DFS
+# order, which gives exactly the serial results.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PARALLEL_MIN_SPACE = 2000000  # Smallest search space (product of count ranges) worth spreading out
+UNITS_PER_WORKER = 4  # Split a second level when the first gives fewer units than this per worker
+PARALLEL_SERIAL_NODES = 50000  # Nodes searched in-process (about 50 ms) before units go to the pool
+SOLVER_MAX_WORKERS = 8  # Each worker is a whole interpreter; a 4-7 denomination search gains little past this
+
+_solver_pool = None
+_solver_settled = None  # Shared id of the latest solve whose top results are settled
+_solve_counter = 0
+
+def _init_solver_worker(settled):
+    """Process pool initializer: keep the shared settled-solve id"""
+    global _solver_settled
+    _solver_settled = settled
+
+def solver_workers():
+    """Solver processes to run: one per core, up to SOLVER_MAX_WORKERS"""
+    return min(os.cpu_count() or 1, SOLVER_MAX_WORKERS)
+
+def get_solver_pool():
+    """Start the solver process pool on first use"""
+    global _solver_pool, _solver_settled
+    if _solver_pool is None:
+        # Spawn everywhere: forking a process that has Tk running is unsafe
+        context = multiprocessing.get_context("spawn")
+        _solver_settled = context.Value("q", 0)
+        _solver_pool = ProcessPoolExecutor(max_workers=solver_workers(), mp_context=context,
+                                           initializer=_init_solver_worker, initargs=(_solver_settled,))
+    return _solver_pool
+
+def _unit_search(mode, denominations, max_counts, desired_amount, limit, full_blocks, prefix, stop,
+                 min_distance=0, metric="l1"):
+    """Search one subtree, with its own diversity filter"""
+    accept = diversity_filter(min_distance, metric) if min_distance else None
+    if mode == "balanced":
+        return balanced_candidates(denominations, max_counts, desired_amount, limit, full_blocks, prefix, stop, accept)
+    return greedy_search(denominations, max_counts, desired_amount, limit, full_blocks, prefix, stop, accept)
+
+def _search_unit(mode, denominations, max_counts, desired_amount, limit, full_blocks, prefix, solve_id,
+                 min_distance=0, metric="l1", deadline=None):
+    """
+    Worker: search one subtree, giving up once the solve's top results are
+    settled, or with what it has found once a filtered solve's deadline passes
+    """
+    state = {"calls": 0, "stopped": False}
+    past_deadline = diverse_deadline(deadline) if deadline is not None else None
+
+    def stop():
+        state["calls"] += 1
+        if not state["stopped"] and state["calls"] % 4096 == 0:
+            state["stopped"] = _solver_settled.value >= solve_id
+        return state["stopped"] or (past_deadline is not None and past_deadline())
+
+    if _solver_settled.value >= solve_id:
+        return []
+    return _unit_search(mode, denominations, max_counts, desired_amount, limit, full_blocks, prefix, stop,
+                        min_distance, metric)
+
+def _work_units(mode, denominations, max_counts, desired_amount, workers):
+    """Count prefixes for the first one or two denominations, in serial DFS order"""
+    def order(index, total):
+        denom = denominations[index]
+        if mode == "balanced":
+            return balanced_count_order(max_counts[index], min(max_counts[index], (desired_amount - total) // denom))
+        return greedy_count_order(max_counts[index], desired_amount - total, denom)
+
+    units = [(c,) for c in order(0, 0) if denominations[0] * c <= desired_amount]
+    if len(units) < workers * UNITS_PER_WORKER and len(denominations) > 2:
+        units = [(c0, c1) for (c0,) in units for c1 in order(1, denominations[0] * c0)
+                 if denominations[0] * c0 + denominations[1] * c1 <= desired_amount]
+    return units
+
+def parallel_search(mode, denominations, max_counts, desired_amount, full_blocks=False, min_space=PARALLEL_MIN_SPACE,
+                    min_distance=0, metric="l1", stats=None, serial_nodes=PARALLEL_SERIAL_NODES):
+    """
+    Run the greedy or balanced search across processes when the search space
+    is large enough to pay for it and the first serial_nodes nodes don't
+    settle it; otherwise run it serially.
+    Returns the same results, in the same order, as the serial search.
+    With min_distance set, each unit filters its own combos and the merge
+    filters again in DFS order: the results are as diverse as the serial
+    ones but can differ where a unit dropped a combo for a neighbour that
+    the merge then dropped too. A filtered search stops after
+    DIVERSE_SEARCH_BUDGET seconds with what every unit has found by then,
+    setting stats["diversity_cut"] (stats is a dict, if given).
+    """
+    global _solve_counter
+    max_results = 50 if mode == "balanced" else 30
+    limit = max_results * 2 if mode == "balanced" else max_results
+
+    space = 1
+    for max_count in max_counts:
+        space *= max_count + 1
+    workers = solver_workers()
+    accept = diversity_filter(min_distance, metric) if min_distance else None
+    stats = {} if stats is None else stats
+    deadline = time.time() + DIVERSE_SEARCH_BUDGET if min_distance else None
+    stop = diverse_deadline(deadline, stats) if deadline is not None else None
+    if space < min_space or workers < 2 or len(denominations) < 2:
+        if mode == "balanced":
+            return balanced_search(denominations, max_counts, desired_amount, max_results, full_blocks, accept, stop)
+        return greedy_search(denominations, max_counts, desired_amount, max_results, full_blocks, stop=stop,
+                             accept=accept)
+
+    units = _work_units(mode, denominations, max_counts, desired_amount, workers)
+    nodes = [0]
+
+    def over_budget():
+        nodes[0] += 1
+        return nodes[0] > serial_nodes or (stop is not None and stop())
+
+    # The top results are settled once the finished units at the front of
+    # the DFS order hold enough combos; later units can't change them
+    serial_results = []
+    done = 0
+    for prefix in units:
+        unit = _unit_search(mode, denominations, max_counts, desired_amount, limit, full_blocks, prefix,
+                            over_budget, min_distance, metric)
+        out_of_time = stats.get("diversity_cut", False)
+        if nodes[0] > serial_nodes and not out_of_time:
+            break  # Cut short: the pool searches this unit again
+        serial_results.extend(result for result in unit if accept is None or accept(result[0]))
+        done += 1
+        if len(serial_results) >= limit or out_of_time:
+            break
+    if len(serial_results) >= limit or done == len(units) or stats.get("diversity_cut"):
+        results = serial_results[:limit]
+        return rank_balanced(denominations, max_counts, results, max_results) if mode == "balanced" else results
+    units = units[done:]
+
+    pool = get_solver_pool()
+    _solve_counter += 1
+    solve_id = _solve_counter
+    futures = [pool.submit(_search_unit, mode, denominations, max_counts, desired_amount,
+                           limit, full_blocks, prefix, solve_id, min_distance, metric, deadline) for prefix in units]
+    position = {future: i for i, future in enumerate(futures)}
+
+    unit_results = [None] * len(units)
+    settled = 0
+    found = len(serial_results)
+    for future in as_completed(futures):
+        unit_results[position[future]] = future.result()
+        while settled < len(units) and unit_results[settled] is not None:
+            if accept is not None:
+                unit_results[settled] = [result for result in unit_results[settled] if accept(result[0])]
+            found += len(unit_results[settled])
+            settled += 1
+        if found >= limit or settled == len(units):
+            break
+    if deadline is not None and time.time() > deadline:
+        stats["diversity_cut"] = True  # Units still running at the deadline returned what they had
+    _solver_settled.value = solve_id  # Tell workers still on this solve to stop
+    for future in futures:
+        future.cancel()
+
+    results = (serial_results + [combo for unit in unit_results[:settled] for combo in unit])[:limit]
+    if mode == "balanced":
+        return rank_balanced(denominations, max_counts, results, max_results)
     return results
 
+def shutdown_solver_pool():
+    """Stop the solver processes (if they were ever started)"""
+    if _solver_pool is not None:
+        _solver_pool.shutdown(wait=False, cancel_futures=True)
+
+def pack_lower_bound(denominations, max_counts, desired_amount):
+    """
+    Lower bound on the packs any exact split needs: the fractional relaxation,
+    filling from the largest denomination down within the available stock
+    """
+    packs = 0
+    remaining = desired_amount
+    for denom, max_count in sorted(zip(denominations, max_counts), reverse=True):
+        if remaining <= 0:
+            break
+        used = min(max_count, remaining / denom)
+        packs += used
+        remaining -= used * denom
+    return ceil(packs - 1e-9)
+
+def _seed_combo(denominations, max_counts, desired_amount, full_blocks, deadline):
+    """First exact combo in greedy order (most of the earlier denominations first), or None"""
+    last = len(denominations) - 1
+    nodes = [0]
+
+    def recurse(index, combo, total, packs):
+        nodes[0] += 1
+        if nodes[0] % 1024 == 0 and time.perf_counter() > deadline:
+            raise TimeoutError
+        denom = denominations[index]
+        remaining = desired_amount - total
+        if index == last:
+            # The last denomination is forced: no need to loop over its counts
+            count = remaining // denom
+            if remaining % denom == 0 and count <= max_counts[index] \
+                    and (not full_blocks or (packs + count) % 30 == 0):
+                return combo + [count]
+            return None
+        for count in reversed(range(min(max_counts[index], remaining // denom) + 1)):
+            found = recurse(index + 1, combo + [count], total + denom * count, packs + count)
+            if found:
+                return found
+        return None
+
+    try:
+        return recurse(0, [], 0, 0)
+    except TimeoutError:
+        return None
+
+ANYTIME_DEFAULT_BUDGET = 2.0  # Seconds the anytime search gets when its budget field is left blank
+
+def anytime_search(denominations, max_counts, desired_amount, time_budget, max_results=30, full_blocks=False,
+                   min_distance=0, metric="l1"):
+    """
+    Simulated annealing over exact combos for inventories too large to search
+    exhaustively. Starts from the greedy combo and moves value between pairs of
+    denominations (e.g. 1 x $100 <-> 5 x $20) so every state keeps the exact
+    amount. Lower energy = balance score + packs. Always returns the best combos
+    found within the time budget plus search stats, including a pack lower bound.
+    With min_distance set the kept combos are that far apart (see make_room).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+    stats = {"lower_bound": pack_lower_bound(denominations, max_counts, desired_amount),
+             "iterations": 0, "elapsed": 0.0}
+
+    current = _seed_combo(denominations, max_counts, desired_amount, full_blocks, deadline)
+    if current is None:
+        stats["elapsed"] = time.perf_counter() - started
+        return [], stats
+
+    def energy(combo):
+        return calculate_balance_score(denominations, max_counts, combo) + sum(combo)
+
+    # Value-preserving exchanges: give up out_count of i for in_count of j
+    moves = []
+    for i, di in enumerate(denominations):
+        for j, dj in enumerate(denominations):
+            if i != j:
+                lcm = di * dj // gcd(di, dj)
+                out_count, in_count = lcm // di, lcm // dj
+                # With full blocks only, scale moves so the pack count stays a multiple of 30
+                step = 30 // gcd(30, abs(in_count - out_count)) if full_blocks and in_count != out_count else 1
+                moves.append((i, j, out_count * step, in_count * step))
+
+    current_energy = energy(current)
+    best = []  # Max-heap (negated energy) of the best distinct combos seen
+    best_combos = set()
+
+    def offer(combo, combo_energy):
+        key = tuple(combo)
+        if key in best_combos:
+            return
+        if min_distance:
+            removed = make_room(best, (-combo_energy, key), min_distance, metric)
+            if removed is None:
+                return
+            best_combos.difference_update(removed)
+        if len(best) < max_results:
+            heapq.heappush(best, (-combo_energy, key))
+            best_combos.add(key)
+        elif combo_energy < -best[0][0]:
+            _, dropped = heapq.heapreplace(best, (-combo_energy, key))
+            best_combos.discard(dropped)
+            best_combos.add(key)
+
+    offer(current, current_energy)
+    t_start = max(1.0, abs(current_energy) * 0.1)
+    t_end = t_start * 1e-4
+    temperature = t_start
+    largest_stock = max(max_counts)
+    rng = random.Random()
+
+    while moves:
+        stats["iterations"] += 1
+        if stats["iterations"] % 256 == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # Geometric cooling over the time budget
+            temperature = t_start * (t_end / t_start) ** ((now - started) / time_budget)
+
+        i, j, out_count, in_count = rng.choice(moves)
+        # Large jumps while hot, single exchanges once cool
+        reach = max(1, int(largest_stock * temperature / t_start / max(out_count, in_count)))
+        k = min(rng.randint(1, reach), current[i] // out_count, (max_counts[j] - current[j]) // in_count)
+        if k <= 0:
+            continue
+        candidate = list(current)
+        candidate[i] -= k * out_count
+        candidate[j] += k * in_count
+        candidate_energy = energy(candidate)
+        delta = candidate_energy - current_energy
+        if delta <= 0 or rng.random() < exp(-delta / temperature):
+            current, current_energy = candidate, candidate_energy
+            offer(current, current_energy)
+
+    stats["elapsed"] = time.perf_counter() - started
+    ranked = sorted((-neg_energy, combo) for neg_energy, combo in best)
+    return [(combo, sum(combo), desired_amount) for _, combo in ranked], stats
+
+def denom_key(currency, value):
+    """Key of a denomination in all_denom_vars / config.json (see key_suffix in the registry)"""
+    return currency_registry[currency]["keys"][value]
+
+def prepare_search_inputs(currency, desired_amount, stock, only_selected, priority_selected):
+    """
+    Turn the available stock ({denomination key: packs}, blank entries left
+    out) and the Only/Priority selections into the denominations and max
+    counts the searches take
+    """
+    denom_inputs = [(value, stock.get(denom_key(currency, value))) for value in currency_denoms.get(currency, [])]
+
+    # "Only" is a hard constraint: every other denomination is left out of the search
+    if only_selected:
+        denom_inputs = [(value, max_count) for value, max_count in denom_inputs
+                        if denom_key(currency, value) in only_selected]
+
+    # If "Priority" is selected, sort inputs so priority denominations come first
+    # (priority_search relies on this order)
+    if priority_selected:
+        denom_inputs.sort(key=lambda x: (denom_key(currency, x[0]) not in priority_selected, -x[0]))
+
+    # Process all valid denominations
+    denominations = []
+    max_counts = []
+    for value, max_count in denom_inputs:
+        if max_count is None:
+            continue
+        max_useful = min(max_count, desired_amount // value)
+        if max_useful == 0:
+            continue
+        denominations.append(value)
+        max_counts.append(max_useful)
+    return denominations, max_counts
+
+PRIORITY_SEARCH_BUDGET = 0.5  # Seconds before priority_search settles for the best combos found so far
+
+def priority_search(denominations, max_counts, desired_amount, priority_mask, min_priority_share=0,
+                    max_results=30, full_blocks=False, rank="packs", time_budget=PRIORITY_SEARCH_BUDGET, stats=None,
+                    currency=None, min_distance=0, metric="l1"):
+    """
+    Branch-and-bound search that treats Priority as an objective: fewest
+    packs from non-priority denominations first, then fewest packs
+    (rank="packs") or best balance score (rank="balance").
+    min_priority_share is a hard constraint: the percentage of the amount
+    that must be paid in priority denominations.
+    Expects priority denominations first and each group highest first, as
+    prepare_search_inputs orders them.
+    Returns the best max_results combos, best first. If the time budget runs
+    out first they are the best found so far, and stats (a dict, if given)
+    gets "budget_exceeded". With the currency given, its change table bounds
+    the packs any remainder needs and rules out remainders no packs can make.
+    With min_distance set the kept combos are that far apart (see make_room);
+    a combo only gets in by beating the worst kept one, so the bounds still hold.
+    """
+    n = len(denominations)
+    first_other = priority_mask.index(False) if False in priority_mask else n
+    required_priority = desired_amount * min_priority_share / 100
+    deadline = time.perf_counter() + time_budget
+    nodes = [0]
+
+    # Value the denominations from index i on can still add, in total and from priority ones
+    capacity = [0] * (n + 1)
+    priority_capacity = [0] * (n + 1)
+    for i in reversed(range(n)):
+        value = denominations[i] * max_counts[i]
+        capacity[i] = capacity[i + 1] + value
+        priority_capacity[i] = priority_capacity[i + 1] + (value if priority_mask[i] else 0)
+
+    # Denominations from index i on, highest first, for the pack bound
+    by_value = [sorted(range(i, n), key=lambda j: -denominations[j]) for i in range(n + 1)]
+    # Fewer packs of denomination i then always means more packs later on
+    largest_from_here = [all(denominations[j] <= denominations[i] for j in range(i + 1, n)) for i in range(n)]
+
+    # Balance score terms (see calculate_balance_score): a used denomination costs
+    # 100 x its usage ratio and earns back an abundance bonus; the variance term is never negative
+    bonus = [max_count / 100 if max_count >= 10 else 0 for max_count in max_counts]
+    bonus_from = [0] * (n + 1)
+    best_ratio_from = [0] * (n + 1)  # Most value per unit of usage ratio from index i on
+    for i in reversed(range(n)):
+        bonus_from[i] = bonus_from[i + 1] + bonus[i]
+        best_ratio_from[i] = max(best_ratio_from[i + 1], denominations[i] * max_counts[i])
+
+    def other_packs_bound(index, remaining):
+        """Non-priority packs still needed: whatever priority stock can't cover"""
+        start = max(index, first_other)
+        uncovered = max(0, remaining - priority_capacity[index])
+        return pack_lower_bound(denominations[start:], max_counts[start:], uncovered)
+
+    def packs_bound(index, remaining, other_allowance):
+        """
+        Packs still needed, filling from the highest denomination down, when at
+        most other_allowance more non-priority packs may be used (more could
+        never beat the current worst result)
+        """
+        packs = 0
+        for j in by_value[index]:
+            if remaining <= 0:
+                break
+            usable = max_counts[j] if priority_mask[j] else min(max_counts[j], other_allowance)
+            used = min(usable, remaining / denominations[j])
+            packs += used
+            remaining -= used * denominations[j]
+            if not priority_mask[j]:
+                other_allowance -= used
+        if remaining > 1e-9:
+            return float("inf")
+        return ceil(packs - 1e-9)
+
+    def score_bound(index, combo, remaining):
+        """Lowest balance score any completion of combo can reach"""
+        score = 0
+        used = [count for count in combo if count > 0]
+        for i, count in enumerate(combo):
+            if count > 0:
+                score += count / max_counts[i] * 100 - bonus[i]
+        if remaining > 0:
+            score += remaining / best_ratio_from[index] * 100
+        if used:
+            score += variance_bound(index, used, remaining) * 0.1
+        return score - bonus_from[index]
+
+    # For each index, the sums (d, d squared, count) over each nonempty subset of
+    # the denominations from there on: the ones a completion might still use
+    later_subsets = []
+    for i in range(n + 1):
+        subsets = []
+        for mask in range(1, 1 << (n - i)):
+            chosen = [denominations[i + j] for j in range(n - i) if mask >> j & 1]
+            subsets.append((sum(chosen), sum(d * d for d in chosen), len(chosen)))
+        later_subsets.append(subsets)
+
+    def variance_bound(index, used, remaining):
+        """
+        Lowest variance of the used counts once the rest of the amount is paid:
+        the continuous optimum puts each later count x_j at mean + mu x d_j
+        """
+        k = len(used)
+        fixed_sum = sum(used)
+        if remaining == 0:
+            mean = fixed_sum / k
+            return sum((count - mean) ** 2 for count in used) / k
+        lowest = float("inf")
+        for d_sum, d_squares, size in later_subsets[index]:
+            mu = (remaining - fixed_sum * d_sum / k) / (d_sum * d_sum / k + d_squares)
+            mean = (fixed_sum + mu * d_sum) / k
+            spread = sum((count - mean) ** 2 for count in used) + mu * mu * d_squares
+            lowest = min(lowest, spread / (k + size))
+        return lowest
+
+    best = []  # Max-heap of (negated key, combo)
+    best_combos = set()
+
+    def worst_key():
+        return tuple(-x for x in best[0][0])
+
+    def offer(combo, packs, other_packs):
+        combo = tuple(combo)
+        if combo in best_combos:
+            return
+        if rank == "balance":
+            key = (other_packs, calculate_balance_score(denominations, max_counts, combo), packs)
+        else:
+            key = (other_packs, packs)
+        if min_distance:
+            removed = make_room(best, (tuple(-x for x in key), combo), min_distance, metric)
+            if removed is None:
+                return
+            best_combos.difference_update(removed)
+        if len(best) < max_results:
+            heapq.heappush(best, (tuple(-x for x in key), combo))
+        elif key < worst_key():
+            _, dropped = heapq.heapreplace(best, (tuple(-x for x in key), combo))
+            best_combos.discard(dropped)
+        else:
+            return
+        best_combos.add(combo)
+
+    def table_bound(remaining):
+        """
+        Packs the remainder needs with unlimited stock of every pack in the
+        currency (0 if the table can't say, infinite if nothing makes it)
+        """
+        change = lookup_change(currency, remaining) if currency else None
+        if change is None:
+            return 0
+        return float("inf") if change[0] is None else change[0]
+
+    def bound_key(index, combo, remaining, packs, other_packs, worst):
+        """Lower bound on the key of any completion, to compare with the worst kept key"""
+        other_bound = other_packs + other_packs_bound(index, remaining)
+        if other_bound > worst[0]:
+            return (other_bound,)
+        if rank == "packs":
+            return (other_bound, packs + max(packs_bound(index, remaining, worst[0] - other_packs),
+                                             table_bound(remaining)))
+        return (other_bound, score_bound(index, combo, remaining))
+
+    def recurse(index, combo, remaining, packs, other_packs, priority_value):
+        nodes[0] += 1
+        # Balance-ranked nodes score every child up front, so they check the clock each time
+        if (rank == "balance" or nodes[0] % 1024 == 0) and time.perf_counter() > deadline:
+            raise TimeoutError
+        if index == n:
+            if remaining == 0 and (not full_blocks or packs % 30 == 0):
+                offer(combo, packs, other_packs)
+            return
+        if remaining > capacity[index]:
+            return
+        # Share constraint: fixed once the priority denominations are done
+        if priority_value + min(remaining, priority_capacity[index]) < required_priority:
+            return
+        if len(best) == max_results:
+            worst = worst_key()
+            if bound_key(index, combo, remaining, packs, other_packs, worst) > worst[:2]:
+                return
+
+        denom = denominations[index]
+        is_priority = priority_mask[index]
+        if index == n - 1:
+            # The last denomination is forced by the rest
+            if remaining % denom == 0 and remaining // denom <= max_counts[index]:
+                count = remaining // denom
+                recurse(n, combo + [count], 0, packs + count, other_packs + (0 if is_priority else count),
+                        priority_value + (remaining if is_priority else 0))
+            return
+        # Below this count the later denominations can't make up the rest
+        fewest = max(0, -(-(remaining - capacity[index + 1]) // denom))
+        counts = range(min(max_counts[index], remaining // denom), fewest - 1, -1)
+        if rank == "balance":
+            # Most promising counts first: once one can't beat the worst kept result, none after it can
+            children = sorted((other_packs + (0 if is_priority else count)
+                               + other_packs_bound(index + 1, remaining - denom * count),
+                               score_bound(index + 1, combo + [count], remaining - denom * count), count)
+                              for count in counts)
+            for child_bound in children:
+                if len(best) == max_results and child_bound[:2] > worst_key()[:2]:
+                    break
+                count = child_bound[2]
+                recurse(index + 1, combo + [count], remaining - denom * count, packs + count,
+                        other_packs + (0 if is_priority else count),
+                        priority_value + (denom * count if is_priority else 0))
+            return
+        for count in counts:
+            child_other = other_packs + (0 if is_priority else count)
+            child_remaining = remaining - denom * count
+            if len(best) == max_results:
+                worst = worst_key()
+                # Each pack less of this denomination has to be made up by at least one more
+                # non-priority pack, so once the bound fails it fails for every smaller count
+                if child_other + other_packs_bound(index + 1, child_remaining) > worst[0]:
+                    break
+                # Likewise for the pack count when nothing later is worth more than this denomination
+                if rank == "packs" and largest_from_here[index] and (child_other, packs + count + packs_bound(
+                        index + 1, child_remaining, worst[0] - child_other)) > worst:
+                    break
+            recurse(index + 1, combo + [count], child_remaining, packs + count, child_other,
+                    priority_value + (denom * count if is_priority else 0))
+
+    if rank == "balance":
+        # Start from the fewest-packs answers: they already have the fewest non-priority
+        # packs, and the search has something to fall back on if its budget runs out
+        for combo, packs, _ in priority_search(denominations, max_counts, desired_amount, priority_mask,
+                                               min_priority_share, max_results, full_blocks, "packs",
+                                               time_budget / 4, stats, currency):
+            offer(combo, packs, sum(c for c, p in zip(combo, priority_mask) if not p))
+
+    try:
+        recurse(0, [], desired_amount, 0, 0, 0)
+    except TimeoutError:
+        if stats is not None:
+            stats["budget_exceeded"] = True
+    ranked = sorted((tuple(-x for x in key), combo) for key, combo in best)
+    return [(combo, sum(combo), desired_amount) for _, combo in ranked]
+
+def solve_job(mode, currency, denominations, max_counts, desired_amount, full_blocks=False,
+              time_budget=ANYTIME_DEFAULT_BUDGET, priority_mask=None, min_priority_share=0, min_distance=0, metric="l1",
+              parallel=True):
+    """
+    Run the search for a mode ("greedy", "balanced" or "anytime") and return
+    (results, stats) with results ranked for display; stats carries the
+    anytime search's figures and "budget_exceeded" from priority_search.
+    priority_mask flags the priority denominations.
+    min_distance > 0 keeps only results that far apart (see diversity_filter).
+    parallel=False keeps the searches in this process, for callers that are
+    already running in a solver pool worker.
+    """
+    # Workers must never start a pool of their own
+    min_space = PARALLEL_MIN_SPACE if parallel else float("inf")
+    # The change table rules out unreachable amounts without searching
+    change = lookup_change(currency, desired_amount)
+    if change is not None and change[0] is None:
+        return [], {}
+    # Priority is part of the objective, so it gets its own optimal search in every mode.
+    # It and the anytime search keep a ranked top list rather than a stream of finds,
+    # so a better combo displaces kept ones too close to it instead (see make_room)
+    stats = {}
+    if priority_mask and any(priority_mask):
+        if mode == "greedy":
+            results = priority_search(denominations, max_counts, desired_amount, priority_mask, min_priority_share,
+                                      30, full_blocks, "packs", stats=stats, currency=currency,
+                                      min_distance=min_distance, metric=metric)
+        else:
+            results = priority_search(denominations, max_counts, desired_amount, priority_mask, min_priority_share,
+                                      50, full_blocks, "balance", stats=stats, currency=currency,
+                                      min_distance=min_distance, metric=metric)
+        return results, stats
+    if mode == "anytime":
+        return anytime_search(denominations, max_counts, desired_amount, time_budget, full_blocks=full_blocks,
+                              min_distance=min_distance, metric=metric)
+    if mode == "balanced":
+        return parallel_search("balanced", denominations, max_counts, desired_amount, full_blocks, min_space,
+                               min_distance, metric, stats), stats
+
+    results = parallel_search("greedy", denominations, max_counts, desired_amount, full_blocks, min_space,
+                              min_distance, metric, stats)
+    limit = max(len(results), 1)
+    # The DFS lists the first splits it finds, not the fewest packs, so the top row
+    # comes from the change table when stock allows its split, else from branch and bound
+    fewest = exact_change_combo(currency, desired_amount, denominations, max_counts)
+    if not fewest or (full_blocks and fewest[1] % 30):
+        fewest = next(iter(priority_search(denominations, max_counts, desired_amount, [False] * len(denominations),
+                                           0, 1, full_blocks, "packs", stats=stats, currency=currency)), None)
+    if fewest and all(combo != fewest[0] for combo, _, _ in results):
+        if min_distance:
+            # It displaces any combo too close to it
+            results = [result for result in results if combo_distance(result[0], fewest[0], metric) >= min_distance]
+        results.append(fewest)
+    # Fewest packs first
+    results.sort(key=lambda x: x[1])
+    del results[limit:]
+    return results, stats
+
+# Columnar result store
+# Results are kept as one typed array per column (a count column per
+# denomination, then packs, blocks, volume, container, containers needed
+# and balance score), about 38 bytes per row for four denominations, so a
+# million candidate splits fit in well under 50 MB. The binary export
+# writes the column buffers straight to disk.
+RESULT_FILE_MAGIC = b"CDRS"
+RESULT_FILE_HEADER = struct.Struct("<4sHHQI")  # magic, version, denominations, rows, metadata bytes
+RESULT_COLUMNS = (("packs", "I"), ("blocks", "I"), ("volume", "f"),
+                  ("container", "H"), ("containers_needed", "I"), ("score", "f"))
+
+last_results = None  # Result store behind the rows currently in the table
+
+def new_result_store(currency, denominations, amount=None):
+    """Create an empty result store for splits of the amount over the given denominations"""
+    store = {"currency": currency, "denominations": list(denominations), "amount": amount,
+             "counts": [array("I") for _ in denominations], "container_names": []}
+    for column, typecode in RESULT_COLUMNS:
+        store[column] = array(typecode)
+    return store
+
+def append_result(store, combo, packs, volume, container_name, containers_needed, score):
+    """Add one split to the store and return its row number"""
+    names = store["container_names"]
+    if container_name not in names:
+        names.append(container_name)
+    for column, count in zip(store["counts"], combo):
+        column.append(count)
+    store["packs"].append(packs)
+    store["blocks"].append(packs // 30)
+    store["volume"].append(volume)
+    store["container"].append(names.index(container_name))
+    store["containers_needed"].append(containers_needed)
+    store["score"].append(score)
+    return len(store["packs"]) - 1
+
+def result_row(store, row):
+    """One stored split as a record"""
+    record = {column: store[column][row] for column, _ in RESULT_COLUMNS}
+    record["combo"] = tuple(column[row] for column in store["counts"])
+    record["container"] = store["container_names"][record["container"]]
+    return record
+
+def export_results_csv(store, path):
+    """Write the store as CSV, one row per split"""
+    labels = [label_map.get(denom_key(store["currency"], d), str(d)) for d in store["denominations"]]
+    names = store["container_names"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(labels + [column for column, _ in RESULT_COLUMNS])
+        # float32 columns widen to doubles like 99.80000305175781, so they are rounded on the way out
+        columns = store["counts"] + [store[column] if typecode != "f" else (round(value, 2) for value in store[column])
+                                     for column, typecode in RESULT_COLUMNS]
+        # Stream rows straight off the columns, naming containers on the way out
+        columns[len(store["counts"]) + 3] = (names[i] for i in store["container"])
+        writer.writerows(zip(*columns))
+
+def export_results_binary(store, path):
+    """
+    Write the store as a compact binary file: a header, JSON metadata
+    (currency, amount, denominations, container names), then each column's
+    raw little-endian buffer
+    """
+    metadata = json.dumps({"currency": store["currency"], "amount": store["amount"],
+                           "denominations": store["denominations"],
+                           "container_names": store["container_names"]}).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(RESULT_FILE_HEADER.pack(RESULT_FILE_MAGIC, 1, len(store["denominations"]),
+                                        len(store["packs"]), len(metadata)))
+        f.write(metadata)
+        for column in store["counts"] + [store[column] for column, _ in RESULT_COLUMNS]:
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            column.tofile(f)
+
+def load_results_binary(path):
+    """Read a store written by export_results_binary"""
+    with open(path, "rb") as f:
+        magic, version, _, rows, metadata_size = RESULT_FILE_HEADER.unpack(f.read(RESULT_FILE_HEADER.size))
+        if magic != RESULT_FILE_MAGIC or version != 1:
+            raise ValueError(f"{path} is not a result file")
+        metadata = json.loads(f.read(metadata_size).decode("utf-8"))
+        store = new_result_store(metadata["currency"], metadata["denominations"], metadata.get("amount"))
+        store["container_names"] = metadata["container_names"]
+        for column in store["counts"] + [store[column] for column, _ in RESULT_COLUMNS]:
+            column.fromfile(f, rows)
+            if sys.byteorder == "big":
+                column.byteswap()
+    return store
+
+def export_results():
+    """Save the current results as CSV or as a binary result file (.cdr)"""
+    if last_results is None or not len(last_results["packs"]):
+        messagebox.showwarning("No Results", "Calculate some results first.")
+        return
+    path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                        filetypes=[("CSV", "*.csv"), ("Binary results", "*.cdr")])
+    if not path:
+        return
+    try:
+        if path.lower().endswith(".cdr"):
+            export_results_binary(last_results, path)
+        else:
+            export_results_csv(last_results, path)
+    except Exception as e:
+        messagebox.showerror("Error", f"Error exporting results: {str(e)}")
+
 def clear_results_table():
     """Clear all results from the table to indicate job completion"""
+    global last_results
+    last_results = None
     for i in tree.get_children():
         tree.delete(i)
     # Insert a completion message
     tree.insert("", tk.END, values=("Job completed - inventory updated", "", "", "", ""))
 
+# The denomination fields show the shared stock record (see the reservation
+# store). A field that differs from what it last showed was recounted here
+# and is written to the store; every other field takes the store's count,
+# which includes other planners' debits.
+stock_synced = {}  # Field values as of the last sync with the shared stock
+
+def sync_stock_fields():
+    """Write recounts typed into the denomination fields to the shared stock, then show its counts"""
+    recounts = {}
+    for key, var in all_denom_vars.items():
+        value = var.get().strip()
+        if value != stock_synced.get(key, ""):
+            recounts[key] = int(value) if value else None
+    if recounts:
+        set_stock(recounts)
+    on_hand = stock_on_hand()
+    for key, var in all_denom_vars.items():
+        value = str(on_hand[key]) if key in on_hand else ""
+        if var.get().strip() != value:
+            var.set(value)
+        stock_synced[key] = value
+
+def load_shared_stock():
+    """Start the shared stock from config.json if it is new, then show its counts"""
+    local = {key: var.get().strip() for key, var in all_denom_vars.items()}
+    seed_stock({key: int(value) for key, value in local.items() if value.isdigit()})
+    stock_synced.update(local)  # What config.json holds is not a recount
+    sync_stock_fields()
+
+def read_job_inputs():
+    """
+    The job as entered: (currency, desired amount, denominations, max counts,
+    priority mask), from the shared stock less packs held by other planners
+    """
+    desired_amount = int(amount_var.get())
+    currency = currency_var.get()
+
+    # Packs held by other planners are not available to this solve
+    sync_stock_fields()
+    held = held_counts()
+    stock = {}
+    for value in currency_denoms.get(currency, []):
+        denom_str = denom_key(currency, value)
+        count_str = all_denom_vars[denom_str].get().strip()
+        if count_str:
+            stock[denom_str] = max(0, int(count_str) - held.get(denom_str, 0))
+
+    # Handle "Only" and "Priority" modes
+    only_selected = [value for value, var in only_vars.items() if var.get()]
+    priority_selected = [value for value, var in priority_vars.items() if var.get()]
+    denominations, max_counts = prepare_search_inputs(currency, desired_amount, stock,
+                                                      only_selected, priority_selected)
+    priority_mask = [denom_key(currency, d) in priority_selected for d in denominations]
+    return currency, desired_amount, denominations, max_counts, priority_mask
+
 def calculate_splits():
     """Main calculation function that processes user input and generates results"""
+    global last_results
+    last_results = None
     try:
-        desired_amount = int(amount_var.get())
-        currency = currency_var.get()
-
-        # Prepare denomination inputs based on selected currency
-        denom_inputs = []
-        if currency == "Dollars":
-            denom_inputs = [(10000, d10k_var), (5000, d5k_var), (2000, d2k_var), (1000, d1k_var)]
-        elif currency == "Euros":
-            denom_inputs = [(10000, e10k_var), (5000, e5k_var), (2000, e2k_var)]
-        elif currency == "Yen":
-            denom_inputs = [(1000000, y1m_var), (500000, y500k_var), (100000, y100k_var)]
-
-        # Handle "Only" and "Priority" modes
-        only_selected = [value for value, var in only_vars.items() if var.get()]
-        priority_selected = [value for value, var in priority_vars.items() if var.get()]
-
-        # If "Only" is selected, use only that denomination
-        if only_selected:
-            denominations = []
-            max_counts = []
-            for value, var in denom_inputs:
-                # Convert value to string for comparison with only_selected
-                value_str = str(value) + ('e' if currency == 'Euros' else '')
-                if value_str in only_selected:
-                    count_str = var.get().strip()
-                    if not count_str:
-                        continue
-                    max_count = int(count_str)
-                    max_useful = min(max_count, desired_amount // value + 1)
-                    denominations.append(value)
-                    max_counts.append(max_useful)
-            allow_partial_packs = True
-        else:
-            # If "Priority" is selected, sort inputs so priority denominations come first
-            allow_partial_packs = False
-            if priority_selected:
-                # Convert priority_selected to match the value format
-                priority_values = []
-                for p in priority_selected:
-                    if p.endswith('e'):
-                        priority_values.append(int(p[:-1]))
-                    else:
-                        priority_values.append(int(p))
-                denom_inputs.sort(key=lambda x: (x[0] not in priority_values, -x[0]))
-
-            # Process all valid denominations
-            denominations = []
-            max_counts = []
-            for value, var in denom_inputs:
-                count_str = var.get().strip()
-                if not count_str:
-                    continue
-                max_count = int(count_str)
-                max_useful = min(max_count, desired_amount // value)
-                if max_useful == 0:
-                    continue
-                denominations.append(value)
-                max_counts.append(max_useful)
+        mode = search_mode.get()
+        status_var.set("")
+        currency, desired_amount, denominations, max_counts, priority_mask = read_job_inputs()
 
         if not denominations:
             for i in tree.get_children(): tree.delete(i)
             tree.insert("", tk.END, values=("No valid denominations", "", "", "", ""))
             return
 
-        # Choose algorithm based on balanced mode
-        if balanced_mode.get():
-            results = balanced_search(denominations, max_counts, desired_amount)
-        else:
-            results = greedy_search(denominations, max_counts, desired_amount)
+        # Only the anytime search reads its budget field, so a stray entry there can't break the other modes
+        time_budget = ANYTIME_DEFAULT_BUDGET
+        if mode == "anytime" and anytime_budget_var.get().strip():
+            time_budget = float(anytime_budget_var.get())
+        min_difference = int(min_difference_var.get() or 0)
+        results, stats = solve_job(mode, currency, denominations, max_counts, desired_amount,
+                                   full_blocks_only.get(), time_budget,
+                                   priority_mask, float(priority_share_var.get() or 0), min_difference)
+        if stats.get("budget_exceeded") and any(priority_mask):
+            status_var.set(f"Priority search stopped after {PRIORITY_SEARCH_BUDGET:g}s: "
+                           f"showing the best splits found so far")
+        elif stats.get("budget_exceeded"):
+            # Only Fewest Packs' top-row search has this budget without Priority
+            status_var.set(f"Fewest-packs search stopped after {PRIORITY_SEARCH_BUDGET:g}s: "
+                           f"the top split may not use the fewest packs")
+        if stats.get("diversity_cut"):
+            status_var.set(f"Stopped looking for splits {min_difference} packs apart after "
+                           f"{DIVERSE_SEARCH_BUDGET:g}s: showing the {len(results)} found")
+        # With a Priority box ticked every mode runs priority_search, which has no anytime figures
+        if mode == "anytime" and results and "lower_bound" in stats:
+            best_packs = min(packs for _, packs, _ in results)
+            status_var.set(f"Anytime: best {best_packs} packs, lower bound {stats['lower_bound']} "
+                           f"(gap {best_packs - stats['lower_bound']}), "
+                           f"{stats['iterations']} moves in {stats['elapsed']:.1f}s")
 
         container_name = container_var.get()
         container_capacity = flat_containers.get(container_name, 1)
@@ -290,31 +1440,35 @@ def calculate_splits():
         # Clear previous results
         for i in tree.get_children(): tree.delete(i)
 
+        last_results = new_result_store(currency, denominations, desired_amount)
         if results:
-            # For regular mode, sort by packs; for balanced mode, results are already optimally sorted
-            if not balanced_mode.get():
-                results.sort(key=lambda x: x[1])
-            
             # Display results in the table
             for combo, packs, total in results:
                 blocks = packs // 30
-                volume = calculate_volume(denominations, combo)
+                volume = calculate_volume(denominations, combo, currency)
                 containers_needed = ceil(volume / container_capacity)
+                balance_score = calculate_balance_score(denominations, max_counts, combo)
+                row = append_result(last_results, combo, packs, volume, container_name, containers_needed, balance_score)
                 
                 # Use the new sorted counts string function
                 counts_str = create_sorted_counts_string(denominations, combo, currency)
                 
-                # Add balance indicator for balanced mode using ASCII characters
+                # Add balance indicator for balanced and anytime modes using ASCII characters
                 balance_indicator = ""
-                if balanced_mode.get():
-                    balance_score = calculate_balance_score(denominations, max_counts, combo)
+                if mode != "greedy":
                     if balance_score < 50:
                         balance_indicator = " *VB"  # Very balanced
                     elif balance_score < 100:
                         balance_indicator = " *GB"  # Good balance
                 
-                tree.insert("", tk.END, values=(
-                    counts_str + balance_indicator, packs, blocks, int(volume), f"{containers_needed} x {container_name}"
+                # Recommend the container that needs the fewest units and wastes the least space
+                best_fit = recommend_container(volume)
+                best_fit_str = f"{best_fit[1]} x {best_fit[0]}" if best_fit else ""
+                
+                # Row ids point back into the result store
+                tree.insert("", tk.END, iid=str(row), values=(
+                    counts_str + balance_indicator, packs, blocks, int(volume), f"{containers_needed} x {container_name}",
+                    best_fit_str
                 ))
         else:
             tree.insert("", tk.END, values=("No valid combinations found", "", "", "", ""))
@@ -324,15 +1478,114 @@ def calculate_splits():
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
+# Scenario comparison
+# Container choice only changes how the volume is split into containers, so
+# each search mode is solved once and its top split is then priced against
+# every container in flat_containers.
+COMPARE_MODES = ("greedy", "balanced")
+
+compare_view = None  # The comparison window, built on first use and reused
+
+def compare_scenarios(currency, denominations, max_counts, desired_amount, full_blocks=False,
+                      priority_mask=None, min_priority_share=0, modes=COMPARE_MODES):
+    """
+    Solve the job once per mode and evaluate the top split in every container.
+    Returns rows {mode, container, packs, containers_needed, wasted}, fewest
+    containers and then least wasted volume first within each mode.
+    """
+    rows = []
+    for mode in modes:
+        results, _ = solve_job(mode, currency, denominations, max_counts, desired_amount, full_blocks,
+                               priority_mask=priority_mask, min_priority_share=min_priority_share)
+        if not results:
+            continue
+        combo, packs, _ = results[0]
+        volume = calculate_volume(denominations, combo, currency)
+        mode_rows = []
+        for name, capacity in flat_containers.items():
+            needed = max(1, ceil(volume / capacity))
+            mode_rows.append({"mode": mode, "container": name, "packs": packs,
+                              "containers_needed": needed, "wasted": needed * capacity - volume})
+        mode_rows.sort(key=lambda row: (row["containers_needed"], row["wasted"]))
+        rows.extend(mode_rows)
+    return rows
+
+def build_compare_view():
+    """Build the comparison window once; it is hidden between uses"""
+    window = tk.Toplevel(root)
+    window.withdraw()
+    window.title("Compare Containers and Modes")
+    window.transient(root)
+    window.configure(bg=get_theme_colors()["bg"])
+
+    columns = ("Mode", "Container", "Packs", "Containers", "Wasted Volume")
+    table = ttk.Treeview(window, columns=columns, show="headings", height=16)
+    for col in columns:
+        table.heading(col, text=col, command=lambda _col=col: sort_column(table, _col, False))
+        table.column(col, width=120, anchor="center")
+    scrollbar = ttk.Scrollbar(window, orient="vertical", command=table.yview)
+    table.configure(yscrollcommand=scrollbar.set)
+    table.grid(row=0, column=0, sticky="nsew", padx=(10, 0), pady=10)
+    scrollbar.grid(row=0, column=1, sticky="ns", padx=(0, 10), pady=10)
+    ttk.Label(window, text="Double-click a row to use that container and mode",
+              style="Hint.TLabel").grid(row=1, column=0, columnspan=2, pady=(0, 10))
+    window.columnconfigure(0, weight=1)
+    window.rowconfigure(0, weight=1)
+
+    def use_scenario(event):
+        """Adopt the clicked scenario's container and mode and recalculate"""
+        selection = table.selection()
+        if not selection:
+            return
+        mode, container = table.item(selection[0], "values")[:2]
+        search_mode.set(mode)
+        select_container(container)
+        window.withdraw()
+        calculate_splits()
+
+    table.bind("<Double-1>", use_scenario)
+    window.protocol("WM_DELETE_WINDOW", window.withdraw)
+    return {"window": window, "table": table}
+
+def show_comparison():
+    """Compare button: evaluate every container and search mode for the current job"""
+    global compare_view
+    try:
+        currency, desired_amount, denominations, max_counts, priority_mask = read_job_inputs()
+        if not denominations:
+            messagebox.showwarning("No Denominations", "No valid denominations for this amount.")
+            return
+        rows = compare_scenarios(currency, denominations, max_counts, desired_amount, full_blocks_only.get(),
+                                 priority_mask, float(priority_share_var.get() or 0))
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    if not rows:
+        messagebox.showinfo("No Combinations", "No valid combinations found.")
+        return
+
+    if compare_view is None:
+        compare_view = build_compare_view()
+    table = compare_view["table"]
+    table.delete(*table.get_children())
+    for row in rows:
+        table.insert("", tk.END, values=(row["mode"], row["container"], row["packs"],
+                                         row["containers_needed"], int(row["wasted"])))
+    window = compare_view["window"]
+    window.configure(bg=get_theme_colors()["bg"])
+    window.deiconify()
+    window.lift()
+
 def setup_result_table(root):
     """Create and configure the results table"""
-    columns = ("Counts", "Packs", "Blocks", "Volume", "Containers Needed")
+    columns = ("Counts", "Packs", "Blocks", "Volume", "Containers Needed", "Best Fit")
     col_widths = {
         "Counts": 380,  # Increased width for balance indicators
         "Packs": 60,
         "Blocks": 70,
         "Volume": 70,
-        "Containers Needed": 180
+        "Containers Needed": 180,
+        "Best Fit": 160
     }
 
     tree = ttk.Treeview(root, columns=columns, show="headings")
@@ -370,11 +1623,11 @@ def create_container_selection():
     """Create the container selection UI with grouped buttons"""
     global container_buttons, current_container_button, container_frame
     
-    container_frame = tk.Frame(root)
+    container_frame = ttk.Frame(root)
     container_frame.grid(row=1, column=0, columnspan=12, sticky="ew", pady=(0, 20))
     
     # Title
-    tk.Label(container_frame, text="Select Container Type:", font=("Arial", 10, "bold")).grid(row=0, column=0, columnspan=4, sticky="w", pady=(0, 10))
+    ttk.Label(container_frame, text="Select Container Type:", style="Header.TLabel").grid(row=0, column=0, columnspan=4, sticky="w", pady=(0, 10))
     
     container_buttons = {}
     current_container_button = None
@@ -383,20 +1636,18 @@ def create_container_selection():
     row_offset = 1
     for category, items in containers.items():
         # Category label
-        category_label = tk.Label(container_frame, text=category, font=("Arial", 9, "bold"), fg="#666666")
+        category_label = ttk.Label(container_frame, text=category, style="Category.TLabel")
         category_label.grid(row=row_offset, column=0, columnspan=4, sticky="w", pady=(10, 5))
         row_offset += 1
         
         # Container buttons in this category (max 4 per row)
         col = 0
         for container_name, capacity in items.items():
-            btn = tk.Button(container_frame, 
+            btn = ttk.Button(container_frame, 
                           text=f"{container_name}\n({capacity})",
                           command=lambda name=container_name: select_container(name),
-                          width=12, height=2,
-                          relief="raised",
-                          borderwidth=2,
-                          font=("Arial", 8))
+                          width=12,
+                          style="Container.TButton")
             btn.grid(row=row_offset, column=col, padx=5, pady=2, sticky="ew")
             container_buttons[container_name] = btn
             
@@ -410,6 +1661,27 @@ def create_container_selection():
     
     return container_frame
 
+def build_currency_panel(currency):
+    """Build the denomination entries for one currency the first time it is shown"""
+    panel = ttk.Frame(denom_frame)
+    ttk.Label(panel, text=currency, style="Subheader.TLabel").grid(row=0, column=0, columnspan=4, sticky="w", pady=(0, 5))
+    for i, (denom_str, var) in enumerate(currency_inputs[currency], start=1):
+        ttk.Label(panel, text=label_map[denom_str]).grid(row=i, column=0, sticky="e", padx=(0, 10))
+        ttk.Entry(panel, textvariable=var, width=8).grid(row=i, column=1, padx=(0, 10))
+        ttk.Checkbutton(panel, text="Only", variable=only_vars[denom_str]).grid(row=i, column=2, padx=(0, 10))
+        ttk.Checkbutton(panel, text="Priority", variable=priority_vars[denom_str]).grid(row=i, column=3)
+    currency_panels[currency] = panel
+    return panel
+
+def show_currency_panel(*args):
+    """Show the active currency's denomination panel, building it on demand"""
+    currency = currency_var.get()
+    for name, panel in currency_panels.items():
+        if name != currency:
+            panel.grid_remove()
+    panel = currency_panels.get(currency) or build_currency_panel(currency)
+    panel.grid(row=1, column=0, columnspan=12, sticky="w")
+
 def select_container(container_name):
     """Handle container selection and visual feedback"""
     global current_container_button
@@ -423,415 +1695,851 @@ def select_container(container_name):
     current_container_button = container_buttons[container_name]
     
     # Highlight selected button with green background
-    current_container_button.configure(bg="#4CAF50", fg="white", relief="sunken", borderwidth=3)
+    current_container_button.configure(style="SelectedContainer.TButton")
 
 def reset_button_style(button):
-    """Reset button to default style based on current theme"""
-    theme = theme_var.get()
-    if theme == "dark":
-        button.configure(bg="#3e3e3e", fg="white", relief="raised", borderwidth=2)
-    else:
-        button.configure(bg="#f0f0f0", fg="black", relief="raised", borderwidth=2)
+    """Reset button to the unselected container style"""
+    button.configure(style="Container.TButton")
+
+# Theme palettes
+themes = {
+    "dark": {
+        "bg": "#2e2e2e", 
+        "fg": "#ffffff",
+        "entry_bg": "#3e3e3e", 
+        "entry_fg": "#ffffff",
+        "tree_bg": "#3e3e3e", 
+        "tree_fg": "#ffffff",
+        "highlight": "#555555",
+        "button_bg": "#3e3e3e", 
+        "button_fg": "#ffffff",
+        "frame_bg": "#2e2e2e",
+        "label_fg": "#ffffff",
+        "category_fg": "#cccccc",
+        "dialog_bg": "#2e2e2e",
+        "section_bg": "#1a1a1a",
+        "text_color": "#ffffff"
+    },
+    "light": {
+        "bg": "#f0f0f0", 
+        "fg": "#000000",
+        "entry_bg": "#ffffff", 
+        "entry_fg": "#000000",
+        "tree_bg": "#ffffff", 
+        "tree_fg": "#000000",
+        "highlight": "#cccccc",
+        "button_bg": "#f0f0f0", 
+        "button_fg": "#000000",
+        "frame_bg": "#f0f0f0",
+        "label_fg": "#000000",
+        "category_fg": "#666666",
+        "dialog_bg": "#f0f8ff",
+        "section_bg": "#e8f4fd",
+        "text_color": "#000000"
+    }
+}
 
 def get_theme_colors():
     """Get current theme colors"""
-    theme = theme_var.get()
-    if theme == "dark":
-        return {
-            "bg": "#2e2e2e", 
-            "fg": "#ffffff",
-            "entry_bg": "#3e3e3e", 
-            "entry_fg": "#ffffff",
-            "tree_bg": "#3e3e3e", 
-            "tree_fg": "#ffffff",
-            "highlight": "#555555",
-            "button_bg": "#3e3e3e", 
-            "button_fg": "#ffffff",
-            "frame_bg": "#2e2e2e",
-            "label_fg": "#ffffff",
-            "category_fg": "#cccccc",
-            "dialog_bg": "#2e2e2e",
-            "section_bg": "#1a1a1a",
-            "text_color": "#ffffff"
-        }
-    else:
-        return {
-            "bg": "#f0f0f0", 
-            "fg": "#000000",
-            "entry_bg": "#ffffff", 
-            "entry_fg": "#000000",
-            "tree_bg": "#ffffff", 
-            "tree_fg": "#000000",
-            "highlight": "#cccccc",
-            "button_bg": "#f0f0f0", 
-            "button_fg": "#000000",
-            "frame_bg": "#f0f0f0",
-            "label_fg": "#000000",
-            "category_fg": "#666666",
-            "dialog_bg": "#f0f8ff",
-            "section_bg": "#e8f4fd",
-            "text_color": "#000000"
-        }
+    return themes.get(theme_var.get(), themes["dark"])
+
+def theme_styles(colors):
+    """
+    Style registry: every named ttk style used by the main window and its
+    options for a palette. Widgets only reference these names, so a theme
+    switch reconfigures this fixed set of styles no matter how many widgets exist.
+    Returns {style name: (configure options, map options)}.
+    """
+    indicator = {"background": colors["bg"], "foreground": colors["fg"], "indicatorcolor": colors["entry_bg"]}
+    indicator_map = {"background": [("active", colors["bg"])], "foreground": [("active", colors["fg"])]}
+    return {
+        "TFrame": ({"background": colors["frame_bg"]}, {}),
+        "TLabel": ({"background": colors["bg"], "foreground": colors["label_fg"]}, {}),
+        "Header.TLabel": ({"font": ("Arial", 10, "bold")}, {}),
+        "Subheader.TLabel": ({"font": ("Arial", 9, "bold")}, {}),
+        "Category.TLabel": ({"foreground": colors["category_fg"], "font": ("Arial", 9, "bold")}, {}),
+        "Hint.TLabel": ({"foreground": "#888888", "font": ("Arial", 9), "justify": "center"}, {}),
+        "TEntry": ({"fieldbackground": colors["entry_bg"], "foreground": colors["entry_fg"],
+                    "insertcolor": colors["entry_fg"]}, {}),
+        "TCheckbutton": (indicator, indicator_map),
+        "TRadiobutton": (indicator, indicator_map),
+        "Accent.TRadiobutton": ({"foreground": "#4CAF50", "font": ("Arial", 9, "bold")},
+                                {"foreground": [("active", "#4CAF50")]}),
+        "Currency.TRadiobutton": ({"font": ("Arial", 10), "padding": (15, 0)}, {}),
+        "TButton": ({"background": colors["button_bg"], "foreground": colors["button_fg"],
+                     "relief": "raised", "borderwidth": 2},
+                    {"background": [("active", colors["highlight"])]}),
+        "Container.TButton": ({"font": ("Arial", 8), "justify": "center", "anchor": "center"}, {}),
+        # Fixed colors that stay the same in both themes
+        "SelectedContainer.TButton": ({"background": "#4CAF50", "foreground": "white", "relief": "sunken",
+                                       "borderwidth": 3, "font": ("Arial", 8), "justify": "center",
+                                       "anchor": "center"},
+                                      {"background": [("active", "#4CAF50")]}),
+        "Calculate.TButton": ({"background": "#4CAF50", "foreground": "white",
+                               "font": ("Arial", 11, "bold"), "padding": (20, 10)},
+                              {"background": [("active", "#43A047")]}),
+        "Apply.TButton": ({"background": "#2196F3", "foreground": "white",
+                           "font": ("Arial", 10), "padding": (15, 5)},
+                          {"background": [("active", "#1E88E5")]}),
+        "Treeview": ({"background": colors["tree_bg"], "foreground": colors["tree_fg"],
+                      "fieldbackground": colors["tree_bg"], "highlightthickness": 0, "rowheight": 24},
+                     {"background": [("selected", colors["highlight"])]}),
+    }
 
 def apply_theme(theme):
-    """Comprehensive theme application for all UI elements"""
+    """Switch every named style to the theme's palette"""
     colors = get_theme_colors()
-    
-    # Apply to root window
-    root.configure(bg=colors["bg"])
-
-    # Comprehensive recursive theme application
-    def apply_recursive(widget):
-        widget_class = widget.__class__.__name__
-        try:
-            if widget_class in ["Label"]:
-                widget.configure(bg=colors["bg"], fg=colors["label_fg"])
-            elif widget_class in ["Button"]:
-                widget.configure(bg=colors["button_bg"], fg=colors["button_fg"])
-            elif widget_class == "Frame":
-                widget.configure(bg=colors["frame_bg"])
-            elif widget_class == "Checkbutton":
-                widget.configure(bg=colors["bg"], fg=colors["fg"], selectcolor=colors["bg"], 
-                               activebackground=colors["bg"], activeforeground=colors["fg"])
-            elif widget_class == "Radiobutton":
-                widget.configure(bg=colors["bg"], fg=colors["fg"], selectcolor=colors["bg"], 
-                               activebackground=colors["bg"], activeforeground=colors["fg"])
-            elif widget_class in ["Entry", "Text"]:
-                widget.configure(bg=colors["entry_bg"], fg=colors["entry_fg"], insertbackground=colors["entry_fg"])
-        except Exception:
-            pass  # Some widgets may not support certain configurations
-        
-        # Apply to all child widgets
-        for child in widget.winfo_children():
-            apply_recursive(child)
-
-    # Apply theme recursively to all widgets
-    apply_recursive(root)
-
-    # Special handling for container buttons
-    if 'container_buttons' in globals():
-        for container_name, button in container_buttons.items():
-            if container_var.get() == container_name:
-                # Keep selected button highlighted in green
-                button.configure(bg="#4CAF50", fg="white", relief="sunken", borderwidth=3)
-            else:
-                # Apply theme to non-selected buttons
-                button.configure(bg=colors["button_bg"], fg=colors["button_fg"], relief="raised", borderwidth=2)
-
-    # Special handling for currency radio buttons
-    if 'currency_radios' in globals():
-        for radio in currency_radios:
-            try:
-                radio.configure(bg=colors["bg"], fg=colors["fg"], selectcolor=colors["bg"], 
-                              activebackground=colors["bg"], activeforeground=colors["fg"])
-            except Exception:
-                pass
-
-    # Apply theme to specific named elements
-    try:
-        instruction_label.configure(bg=colors["bg"], fg="#888888")
-        apply_button.configure(bg="#2196F3", fg="white")  # Keep blue color for apply button
-        calculate_button.configure(bg="#4CAF50", fg="white")  # Keep green color for calculate button
-    except Exception:
-        pass
+    root.configure(bg=colors["bg"])  # The root window is the only classic Tk widget left
 
-    # Configure ttk styles for treeview and other ttk widgets
     style = ttk.Style()
-    style.theme_use("default")
-    style.configure("Treeview",
-        background=colors["tree_bg"],
-        foreground=colors["tree_fg"],
-        fieldbackground=colors["tree_bg"],
-        highlightthickness=0,
-        rowheight=24
-    )
-    style.map("Treeview", background=[("selected", colors["highlight"])])
+    if style.theme_use() != "default":
+        style.theme_use("default")  # The only built-in theme that honours all the color options
+    for name, (options, mapping) in theme_styles(colors).items():
+        style.configure(name, **options)
+        if mapping:
+            style.map(name, **mapping)
+
+confirm_view = None  # The packing confirmation window, built on first use and reused
+
+def selected_jobs():
+    """Records for the selected result rows, read from the result store"""
+    if last_results is None:
+        return []
+    return [result_row(last_results, int(iid)) for iid in tree.selection() if iid.isdigit()]
+
+def batch_counts(store, records):
+    """Total packs per denomination key across the records, highest denomination first"""
+    totals = {}
+    for record in records:
+        for value, count in zip(store["denominations"], record["combo"]):
+            if count:
+                key = denom_key(store["currency"], value)
+                totals[key] = totals.get(key, 0) + count
+    return dict(sorted(totals.items(), key=lambda x: denom_values[x[0]], reverse=True))
+
+def build_confirmation_view():
+    """Build the confirmation window once; it is hidden between uses"""
+    window = tk.Toplevel(root)
+    window.withdraw()
+    window.title("PACKING CONFIRMATION")
+    window.transient(root)  # Set as child of main window
+    window.minsize(600, 400)
+
+    view = {"window": window, "themed": [], "job": tk.StringVar(), "summary": tk.StringVar()}
+
+    def themed(widget, bg_key, fg=None):
+        """Remember which palette entry colors the widget so the view follows theme changes"""
+        view["themed"].append((widget, bg_key, fg))
+        return widget
+
+    main_frame = themed(tk.Frame(window), "dialog_bg")
+    main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+    themed(tk.Label(main_frame, text="PACKING DETAILS", font=("Arial", 20, "bold")),
+           "dialog_bg", "text_color").pack(pady=(0, 15))
+
+    job_frame = themed(tk.Frame(main_frame, relief="raised", borderwidth=2), "section_bg")
+    job_frame.pack(fill="x", pady=(0, 15))
+    themed(tk.Label(job_frame, textvariable=view["job"], font=("Arial", 16, "bold"), fg="#2980b9"),
+           "section_bg").pack(pady=15)
+
+    # Button frame - packed before the details so it keeps its space when the window is small
+    button_frame = themed(tk.Frame(main_frame), "dialog_bg")
+    button_frame.pack(side="bottom", fill="x", pady=(5, 0))
+    button_frame.columnconfigure(0, weight=1)
+    button_frame.columnconfigure(1, weight=1)
+
+    summary_frame = themed(tk.Frame(main_frame, relief="raised", borderwidth=2), "section_bg")
+    summary_frame.pack(side="bottom", fill="x", pady=(0, 20))
+    themed(tk.Label(summary_frame, text="SUMMARY:", font=("Arial", 12, "bold"), fg="#0c5460"),
+           "section_bg").pack(pady=(15, 10))
+    themed(tk.Label(summary_frame, textvariable=view["summary"], font=("Arial", 11), justify="center"),
+           "section_bg", "text_color").pack(pady=(2, 15))
+
+    details_frame = themed(tk.Frame(main_frame, relief="raised", borderwidth=2), "section_bg")
+    details_frame.pack(fill="both", expand=True, pady=(0, 15))
+    themed(tk.Label(details_frame, text="PACK THE FOLLOWING (Highest to Lowest):", font=("Arial", 14, "bold"),
+                    fg="#856404"), "section_bg").pack(pady=(15, 10))
+
+    # A read-only text widget scrolls itself, so long batches need no canvas or global wheel binding
+    details = themed(tk.Text(details_frame, font=("Arial", 14), height=6, relief="flat",
+                             highlightthickness=0, wrap="none", cursor="arrow"), "section_bg", "text_color")
+    scrollbar = ttk.Scrollbar(details_frame, orient="vertical", command=details.yview)
+    details.configure(yscrollcommand=scrollbar.set)
+    details.tag_configure("center", justify="center")
+    scrollbar.pack(side="right", fill="y", pady=(0, 10))
+    details.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+    view["details"] = details
+
+    # CONFIRM button - appropriately sized
+    tk.Button(button_frame, text="CONFIRM\nPACKING", command=confirm_packing,
+              font=("Arial", 12, "bold"), bg="#28a745", fg="white", width=14, height=2,
+              relief="raised", borderwidth=3, cursor="hand2").grid(row=0, column=0, padx=15, pady=5, sticky="ew")
+
+    # CANCEL button - appropriately sized
+    tk.Button(button_frame, text="CANCEL\nRETURN", command=cancel_packing,
+              font=("Arial", 12, "bold"), bg="#dc3545", fg="white", width=14, height=2,
+              relief="raised", borderwidth=3, cursor="hand2").grid(row=0, column=1, padx=15, pady=5, sticky="ew")
+
+    # Closing the window is the same as cancelling
+    window.protocol("WM_DELETE_WINDOW", cancel_packing)
+    window.bind("<Return>", lambda e: confirm_packing())
+    window.bind("<Escape>", lambda e: cancel_packing())
+
+    # Center over the main window the first time; after that it opens wherever the operator left it
+    width, height = 700, 640
+    x = root.winfo_rootx() + (root.winfo_width() - width) // 2
+    y = root.winfo_rooty() + (root.winfo_height() - height) // 2
+    window.geometry(f"{width}x{height}+{max(0, x)}+{max(0, y)}")
+    return view
 
 def show_packing_confirmation():
-    """Show a large confirmation dialog with packing details sorted by denomination (highest to lowest)"""
-    selection = tree.selection()
-    if not selection:
-        messagebox.showwarning("No Selection", "Please select a result from the table first.")
+    """Show the packing details for the selected result rows and ask for confirmation"""
+    global confirm_view
+    records = selected_jobs()
+    if not records:
+        if not tree.selection():
+            messagebox.showwarning("No Selection", "Please select a result from the table first.")
         return
-    
-    # Get the selected row data
-    item = tree.item(selection[0])
-    values = item['values']
-    
-    if values[0] == "No valid denominations" or values[0] == "No valid combinations found" or values[0] == "Job completed - inventory updated":
+
+    store = last_results
+    counts = batch_counts(store, records)
+
+    # Hold the packs while the operator confirms so other planners can't book them
+    sync_stock_fields()
+    plan_id = place_holds(counts)
+    if plan_id is None:
+        # Each row is solved against the whole stock, so a batch of rows can need more than there is
+        on_hand = stock_on_hand()
+        short = [f"* {label_map.get(key, key)}: {count} needed, {on_hand.get(key, 0)} in stock"
+                 for key, count in counts.items() if count > on_hand.get(key, 0)]
+        if short:
+            messagebox.showwarning("Not Enough Stock",
+                                   "The selected jobs need more packs than are in stock:\n"
+                                   + "\n".join(short) + "\nPlease select fewer rows.")
+        else:
+            messagebox.showwarning("Stock Held",
+                                   "Some of these packs are held by another operator.\n"
+                                   "Please calculate again.")
         return
-    
-    # Parse the counts string and create detailed packing information
-    counts_str = values[0].replace(" *VB", "").replace(" *GB", "")
-    currency = currency_var.get()
-    job_amount = amount_var.get()
-    container = container_var.get()
-    packs = values[1]
-    blocks = values[2]
-    volume = values[3]
-    containers_info = values[4]
-    
-    # Get current theme colors
+
+    if confirm_view is None:
+        confirm_view = build_confirmation_view()
+    view = confirm_view
+    # Keep the solved job, not the entry fields, which may have changed since the calculation
+    view.update(plan_id=plan_id, counts=counts, jobs=len(records),
+                amount=store["amount"], currency=store["currency"])
+
+    # Update the view in place
     colors = get_theme_colors()
-    
-    # Count the number of denominations to calculate required window height
-    num_denominations = len([part for part in counts_str.split(", ") if ":" in part])
-    
-    # Calculate dynamic window height based on content
-    # Base height components:
-    # - Title: ~40px
-    # - Job amount section: ~70px  
-    # - Packing details header: ~50px
-    # - Each denomination line: ~30px
-    # - Spacing after denominations: ~20px
-    # - Summary section: ~160px
-    # - Button section: ~100px
-    # - Total padding: ~120px
-    base_height = 40 + 70 + 50 + 20 + 160 + 100 + 150
-    denomination_height = num_denominations * 30
-    calculated_height = base_height + denomination_height
-    
-    # Set minimum and maximum window sizes
-    min_height = 500
-    max_height = 900
-    window_height = max(min_height, min(calculated_height, max_height))
-    window_width = 700
-    
-    # Create confirmation dialog window
-    confirm_window = tk.Toplevel(root)
-    confirm_window.title("PACKING CONFIRMATION")
-    confirm_window.configure(bg=colors["dialog_bg"])
-    confirm_window.resizable(True, True)  # Allow resizing
-    
-    # Make the window appear in front of the main window
-    confirm_window.transient(root)  # Set as child of main window
-    confirm_window.grab_set()       # Make it modal
-    confirm_window.focus_set()      # Give it focus
-    confirm_window.lift()           # Bring to front
-    confirm_window.attributes('-topmost', True)  # Keep on top temporarily
-    
-    # Position popup window in front of and centered on the main program window
-    # This works correctly with multi-monitor setups
-    root.update_idletasks()  # Ensure main window geometry is fully calculated
-    
-    # Get main window's absolute position and size
-    main_x = root.winfo_rootx()  # Use rootx/rooty for multi-monitor support
-    main_y = root.winfo_rooty()
-    main_width = root.winfo_width()
-    main_height = root.winfo_height()
-    
-    # Calculate center position relative to main window (works on any monitor)
-    popup_x = main_x + (main_width - window_width) // 2
-    popup_y = main_y + (main_height - window_height) // 2
-    
-    # Apply the geometry - this will place it on the same monitor as the main window
-    confirm_window.geometry(f"{window_width}x{window_height}+{popup_x}+{popup_y}")
-    
-    # Additional steps to ensure popup appears on correct monitor and in front
-    confirm_window.update_idletasks()  # Force geometry update
-    confirm_window.deiconify()         # Ensure window is visible
-    confirm_window.lift()              # Bring to front
-    confirm_window.focus_force()       # Force focus to popup
-    
-    # If content might be too long, use a scrollable frame
-    if calculated_height > max_height:
-        # Create canvas and scrollbar for scrolling
-        canvas = tk.Canvas(confirm_window, bg=colors["dialog_bg"], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(confirm_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=colors["dialog_bg"])
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True, padx=20, pady=20)
-        scrollbar.pack(side="right", fill="y", pady=20)
-        
-        main_frame = scrollable_frame
-        
-        # Enable mouse wheel scrolling
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
+    for widget, bg_key, fg in view["themed"]:
+        widget.configure(bg=colors[bg_key])
+        if fg:
+            widget.configure(fg=colors[fg])
+    view["window"].configure(bg=colors["dialog_bg"])
+
+    if len(records) == 1:
+        view["job"].set(f"Job Amount: {view['amount']} {view['currency']}")
     else:
-        # Create main frame without scrolling
-        main_frame = tk.Frame(confirm_window, bg=colors["dialog_bg"])
-        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
-    
-    # Main title with themed colors
-    title_label = tk.Label(main_frame, text="PACKING DETAILS", 
-                          font=("Arial", 20, "bold"), 
-                          bg=colors["dialog_bg"], fg=colors["text_color"])
-    title_label.pack(pady=(0, 15))
-    
-    # Job amount section with themed colors
-    job_frame = tk.Frame(main_frame, bg=colors["section_bg"], relief="raised", borderwidth=2)
-    job_frame.pack(fill="x", pady=(0, 15))
-    
-    tk.Label(job_frame, text=f"Job Amount: {job_amount} {currency}", 
-             font=("Arial", 16, "bold"), bg=colors["section_bg"], fg="#2980b9").pack(pady=15)
-    
-    # Packing details section with themed colors
-    details_frame = tk.Frame(main_frame, bg=colors["section_bg"], relief="raised", borderwidth=2)
-    details_frame.pack(fill="x", pady=(0, 15))
-    
-    tk.Label(details_frame, text="PACK THE FOLLOWING (Highest to Lowest):", 
-             font=("Arial", 14, "bold"), bg=colors["section_bg"], fg="#856404").pack(pady=(15, 10))
-    
-    # Parse and display each denomination (already sorted by create_sorted_counts_string)
-    for part in counts_str.split(", "):
-        if ":" in part:
-            denom_label, count = part.split(":")
-            pack_text = f"* {count} packs of {denom_label} bills"
-            tk.Label(details_frame, text=pack_text, 
-                     font=("Arial", 14), bg=colors["section_bg"], fg=colors["text_color"]).pack(pady=3)
-    
-    # Add some spacing after denomination list
-    tk.Label(details_frame, text="", bg=colors["section_bg"]).pack(pady=5)
-    
-    # Summary information with themed colors
-    summary_frame = tk.Frame(main_frame, bg=colors["section_bg"], relief="raised", borderwidth=2)
-    summary_frame.pack(fill="x", pady=(0, 20))
-    
-    tk.Label(summary_frame, text="SUMMARY:", 
-             font=("Arial", 12, "bold"), bg=colors["section_bg"], fg="#0c5460").pack(pady=(15, 10))
-    
-    summary_info = [
+        view["job"].set(f"{len(records)} Jobs of {view['amount']} {view['currency']}")
+
+    details = view["details"]
+    details.configure(state="normal")
+    details.delete("1.0", tk.END)
+    details.insert(tk.END, "\n".join(f"* {count} packs of {label_map.get(key, key)} bills"
+                                     for key, count in counts.items()), "center")
+    details.configure(state="disabled")
+
+    packs = sum(record["packs"] for record in records)
+    if len(records) == 1:
+        record = records[0]
+        containers_info = f"{record['containers_needed']} x {record['container']}"
+    else:
+        needed = {}
+        for record in records:
+            needed[record["container"]] = needed.get(record["container"], 0) + record["containers_needed"]
+        containers_info = ", ".join(f"{count} x {name}" for name, count in needed.items())
+    view["summary"].set("\n".join([
         f"Total Packs: {packs}",
-        f"Full Blocks: {blocks}",
-        f"Volume: {volume}",
+        f"Full Blocks: {sum(record['blocks'] for record in records)}",
+        f"Volume: {int(sum(record['volume'] for record in records))}",
         f"Container: {containers_info}"
-    ]
-    
-    for info in summary_info:
-        tk.Label(summary_frame, text=info, 
-                 font=("Arial", 11), bg=colors["section_bg"], fg=colors["text_color"]).pack(pady=2)
-    
-    # Add some spacing after summary
-    tk.Label(summary_frame, text="", bg=colors["section_bg"]).pack(pady=10)
-    
-    # Button frame - positioned at the bottom with fixed position
-    # If using scrollable frame, buttons should be outside the scroll area
-    if calculated_height > max_height:
-        button_frame = tk.Frame(confirm_window, bg=colors["dialog_bg"])
-        button_frame.pack(side="bottom", fill="x", padx=20, pady=(0, 20))
-    else:
-        button_frame = tk.Frame(main_frame, bg=colors["dialog_bg"])
-        button_frame.pack(side="bottom", fill="x", pady=(5, 0))
-    
-    # Configure button frame columns for equal distribution
-    button_frame.columnconfigure(0, weight=1)
-    button_frame.columnconfigure(1, weight=1)
-    
-    # Define button commands
-    def confirm_packing():
-        """Confirm the packing and update inventory"""
-        try:
-            # Subtract the used amounts from inventory
-            subtract_used_amounts(counts_str)
-            # Clear the results table to indicate completion
-            clear_results_table()
-            # Save the updated state
-            save_memory()
-            # Close the confirmation window silently
-            confirm_window.destroy()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error confirming packing: {str(e)}")
-    
-    def cancel_packing():
-        """Cancel and return to the previous step"""
-        # Close the confirmation window without making any changes
-        confirm_window.destroy()
-    
-    # CONFIRM button - appropriately sized
-    confirm_btn = tk.Button(button_frame, 
-                           text="CONFIRM\nPACKING", 
-                           command=confirm_packing,
-                           font=("Arial", 12, "bold"), 
-                           bg="#28a745", 
-                           fg="white", 
-                           width=14,
-                           height=2,
-                           relief="raised", 
-                           borderwidth=3,
-                           cursor="hand2")
-    confirm_btn.grid(row=0, column=0, padx=15, pady=5, sticky="ew")
-    
-    # CANCEL button - appropriately sized
-    cancel_btn = tk.Button(button_frame, 
-                          text="CANCEL\nRETURN", 
-                          command=cancel_packing,
-                          font=("Arial", 12, "bold"), 
-                          bg="#dc3545", 
-                          fg="white", 
-                          width=14,
-                          height=2,
-                          relief="raised", 
-                          borderwidth=3,
-                          cursor="hand2")
-    cancel_btn.grid(row=0, column=1, padx=15, pady=5, sticky="ew")
-    
-    # Set minimum window size to ensure buttons are always visible
-    confirm_window.minsize(600, 400)
-    
-    # Remove topmost after a short delay to allow normal window interaction
-    confirm_window.after(500, lambda: confirm_window.attributes('-topmost', False))
-    
-    # Force window to update and ensure buttons are visible
-    confirm_window.update_idletasks()
+    ]))
+
+    window = view["window"]
+    window.deiconify()
+    window.lift()
+    window.grab_set()  # Modal while open
+    window.focus_force()
+
+def close_confirmation_view():
+    """Hide the confirmation window until the next use"""
+    window = confirm_view["window"]
+    window.grab_release()
+    window.withdraw()
+
+def confirm_packing():
+    """Confirm the packing and update inventory"""
+    try:
+        # Turn the holds into a debit of the shared stock; they may have expired while the dialog was open
+        delta = commit_holds(confirm_view["plan_id"])
+        if delta is None:
+            close_confirmation_view()
+            messagebox.showerror("Hold Expired",
+                                 "The hold on these packs expired. Please calculate again.")
+            return
+        # Show the debited stock, keeping the debit so it can be undone
+        sync_stock_fields()
+        jobs = confirm_view["jobs"]
+        record_inventory_step(f"{jobs} job{'s' if jobs > 1 else ''} of {confirm_view['amount']} "
+                              f"{confirm_view['currency']}", delta)
+        # Clear the results table to indicate completion
+        clear_results_table()
+        # Save the updated state
+        save_memory()
+        close_confirmation_view()
+    except Exception as e:
+        messagebox.showerror("Error", f"Error confirming packing: {str(e)}")
 
-def subtract_used_amounts(counts_str):
-    """Subtract the used amounts from the denomination variables"""
-    currency = currency_var.get()
-    
-    # Parse and apply the counts
-    for part in counts_str.split(", "):
-        if ":" in part:
-            denom_label, count = part.split(":")
-            count = int(count)
-            
-            # Find the corresponding denomination variable
-            for denom_str, var in all_denom_vars.items():
-                # Skip denominations that don't belong to current currency
-                if currency == "Dollars" and (denom_str.endswith('e') or len(denom_str) > 5):
-                    continue
-                elif currency == "Euros" and not denom_str.endswith('e'):
-                    continue
-                elif currency == "Yen" and (denom_str.endswith('e') or len(denom_str) <= 5):
-                    continue
-                
-                # Convert denomination to label for comparison
-                try:
-                    if currency == "Euros" and denom_str.endswith('e'):
-                        denom_value = int(denom_str[:-1])
-                        label = label_map.get(f"{denom_value}e", str(denom_value))
-                    else:
-                        denom_value = int(denom_str)
-                        label = label_map.get(denom_str, str(denom_value))
-                    
-                    if label == denom_label:
-                        # Get current value and subtract the used amount
-                        current_str = var.get().strip()
-                        if current_str:
-                            current = int(current_str)
-                            remaining = max(0, current - count)
-                            var.set(str(remaining))
-                        break
-                except ValueError:
-                    # Skip invalid denomination strings
-                    continue
+def cancel_packing():
+    """Cancel and return to the previous step"""
+    # Hide the confirmation window without making any changes
+    release_holds(confirm_view["plan_id"])
+    close_confirmation_view()
+
+# Undo/redo of inventory changes
+# Each confirmed packing is stored as the signed change it made to each
+# denomination, so undoing or redoing a step only touches the fields it
+# changed. The last HISTORY_LIMIT steps are saved in config.json.
+HISTORY_LIMIT = 50
+
+inventory_history = {"undo": [], "redo": []}  # Steps: {"label": ..., "delta": {denomination key: change}}
+
+def record_inventory_step(label, delta):
+    """Push a new inventory change; it replaces anything that could be redone"""
+    if not delta:
+        return
+    inventory_history["undo"].append({"label": label, "delta": delta})
+    del inventory_history["undo"][:-HISTORY_LIMIT]
+    inventory_history["redo"].clear()
+    update_history_buttons()
+
+def apply_inventory_delta(delta, sign):
+    """Add (sign 1) or take back (sign -1) a step's change to the shared stock and the fields"""
+    sync_stock_fields()  # Recounts typed since the last sync go in first
+    adjust_stock({denom_str: sign * change for denom_str, change in delta.items()})
+    sync_stock_fields()
+
+def step_inventory_history(source, target, sign, verb):
+    """Move the newest step from one stack to the other, applying it on the way"""
+    if not inventory_history[source]:
+        return
+    step = inventory_history[source].pop()
+    apply_inventory_delta(step["delta"], sign)
+    inventory_history[target].append(step)
+    update_history_buttons()
+    status_var.set(f"{verb}: {step['label']}")
+    save_memory()
+
+def typing_in_field(event):
+    """True when a shortcut was pressed while a text field has focus"""
+    # ttk.Entry covers the Combobox and ttk.Spinbox too
+    return event is not None and isinstance(event.widget, (tk.Entry, tk.Spinbox))
+
+def undo_inventory(event=None):
+    """Put back the packs taken by the last confirmed step"""
+    # Ctrl+Z in a count field shouldn't quietly restock the inventory
+    if typing_in_field(event):
+        return
+    step_inventory_history("undo", "redo", -1, "Undone")
+
+def redo_inventory(event=None):
+    """Take the packs of the last undone step again"""
+    if typing_in_field(event):
+        return
+    step_inventory_history("redo", "undo", 1, "Redone")
+
+def update_history_buttons():
+    """Enable the undo and redo buttons only when there is a step to move"""
+    undo_button.state(["!disabled"] if inventory_history["undo"] else ["disabled"])
+    redo_button.state(["!disabled"] if inventory_history["redo"] else ["disabled"])
 
 def on_result_click(event):
     """Handle clicking on a result row - now shows confirmation dialog"""
     show_packing_confirmation()
 
+# Differential fuzz harness: python Cash_Delivery_Calculator.py --fuzz [cases] [--seed N]
+# Random jobs go through every solver backend. Each result list is checked
+# against the job and against a brute-force reference, failures are shrunk to
+# a minimal job, and the case rate doubles as a throughput benchmark.
+FUZZ_ANYTIME_EVERY = 20  # The anytime search always spends its budget, so only sample it
+FUZZ_PARALLEL_EVERY = 100  # Likewise for the process pool round trip
+FUZZ_ANYTIME_BUDGET = 0.001
+FUZZ_TIMING_JOBS = 5  # Large-stock priority jobs timed per mode after the random cases
+FUZZ_TIMING_LIMIT = 2 * PRIORITY_SEARCH_BUDGET  # Slowest acceptable solve for one of them
+FUZZ_OPTIMAL_BACKENDS = ("exact_change", "solve_job/greedy")  # Fail when the top row misses the optimum
+
+def reference_min_packs(denominations, max_counts, desired_amount, full_blocks=False, cost=sum):
+    """
+    Brute-force minimum packs of an exact split within stock, or None if
+    there is none. A different cost function may rank combos (None rejects one).
+    """
+    best = None
+    last_denom, last_max = denominations[-1], max_counts[-1]
+    ranges = [range(min(m, desired_amount // d) + 1) for d, m in zip(denominations[:-1], max_counts[:-1])]
+    for counts in product(*ranges):
+        # The last denomination is forced by the rest
+        rest = desired_amount - sum(d * c for d, c in zip(denominations, counts))
+        if rest < 0 or rest % last_denom or rest // last_denom > last_max:
+            continue
+        combo = counts + (rest // last_denom,)
+        if full_blocks and sum(combo) % 30:
+            continue
+        value = cost(combo)
+        if value is not None and (best is None or value < best):
+            best = value
+    return best
+
+def random_fuzz_case(rng):
+    """A random job: currency, amount, stock, Only/Priority selections and full-blocks setting"""
+    currency = rng.choice(list(currency_denoms))
+    values = currency_denoms[currency]
+    unit = currency_registry[currency]["unit"]
+    keys = [denom_key(currency, value) for value in values]
+    stock = {key: rng.randint(0, 12) for key in keys if rng.random() < 0.85}
+    amount = rng.randint(0, 60) * unit
+    if rng.random() < 0.05:
+        amount += unit // 2  # Not a multiple of any pack
+    return {
+        "currency": currency,
+        "amount": amount,
+        "stock": stock,
+        "only": rng.sample(keys, rng.randint(1, len(keys))) if rng.random() < 0.15 else [],
+        "priority": rng.sample(keys, rng.randint(1, len(keys))) if rng.random() < 0.3 else [],
+        "priority_share": rng.choice([0, 0, 25, 50, 75]),
+        "full_blocks": rng.random() < 0.15,
+        "min_distance": rng.choice([0, 0, 0, 3, 6])
+    }
+
+def check_fuzz_case(case, backends):
+    """
+    Run a case through the named backends.
+    Returns ({backend: failure message}, {backend: reached the optimal pack count}).
+    """
+    currency, amount, full_blocks = case["currency"], case["amount"], case["full_blocks"]
+    denominations, max_counts = prepare_search_inputs(currency, amount, case["stock"], case["only"], case["priority"])
+    failures = {}
+    optimal = {}
+    if not denominations:
+        return failures, optimal  # The calculator reports "No valid denominations" without searching
+    optimum = reference_min_packs(denominations, max_counts, amount, full_blocks)
+
+    # With priority denominations, solve_job optimizes (non-priority packs, packs) under the share constraint
+    priority_mask = [denom_key(currency, d) in case["priority"] for d in denominations]
+    share = case["priority_share"]
+
+    def priority_cost(combo):
+        if sum(d * c for d, c, p in zip(denominations, combo, priority_mask) if p) < amount * share / 100:
+            return None
+        return (sum(c for c, p in zip(combo, priority_mask) if not p), sum(combo))
+
+    priority_optimum = reference_min_packs(denominations, max_counts, amount, full_blocks, priority_cost) \
+        if any(priority_mask) else None
+
+    for name in backends:
+        if name == "greedy":
+            results = greedy_search(denominations, max_counts, amount, full_blocks=full_blocks)
+        elif name == "balanced":
+            results = balanced_search(denominations, max_counts, amount, full_blocks=full_blocks)
+        elif name == "exact_change":
+            exact = exact_change_combo(currency, amount, denominations, max_counts)
+            results = [exact] if exact and (not full_blocks or exact[1] % 30 == 0) else []
+        elif name == "parallel":
+            for mode, serial in (("greedy", greedy_search), ("balanced", balanced_search)):
+                # No serial pass, so every unit goes through the pool and the merge
+                if parallel_search(mode, denominations, max_counts, amount, full_blocks, min_space=0, serial_nodes=0) \
+                        != serial(denominations, max_counts, amount, full_blocks=full_blocks):
+                    failures[name] = f"{mode} results differ from the serial search"
+            continue
+        else:
+            mode = name.split("/")[1]
+            results = solve_job(mode, currency, denominations, max_counts, amount, full_blocks,
+                                FUZZ_ANYTIME_BUDGET, priority_mask, share, case["min_distance"])[0]
+            if any(combo_distance(a[0], b[0]) < case["min_distance"]
+                   for i, a in enumerate(results) for b in results[:i]):
+                failures[name] = f"two combos are closer than {case['min_distance']} packs"
+                continue
+
+        for combo, packs, total in results:
+            if len(combo) != len(denominations) or sum(d * c for d, c in zip(denominations, combo)) != amount \
+                    or total != amount or packs != sum(combo):
+                failures[name] = f"{combo} does not add up to {amount}"
+            elif any(c < 0 or c > m for c, m in zip(combo, max_counts)):
+                failures[name] = f"{combo} exceeds max counts {max_counts}"
+            elif full_blocks and packs % 30:
+                failures[name] = f"{combo} is not made of full blocks"
+            elif optimum is not None and packs < optimum:
+                failures[name] = f"{combo} beats the reference optimum of {optimum} packs"
+            if name in failures:
+                break
+        if name in failures:
+            continue
+        if name.startswith("solve_job/") and any(priority_mask):
+            if any(priority_cost(combo) is None for combo, _, _ in results):
+                failures[name] = f"a combo pays less than {share}% in priority denominations"
+            elif bool(results) != (priority_optimum is not None):
+                failures[name] = f"found {len(results)} combos, priority reference optimum is {priority_optimum}"
+            elif results and priority_cost(results[0][0])[:1 if mode != "greedy" else 2] \
+                    != priority_optimum[:1 if mode != "greedy" else 2]:
+                failures[name] = f"best combo {results[0][0]} misses the priority optimum {priority_optimum}"
+            elif results and mode != "greedy":
+                optimal[name] = min(packs for _, packs, _ in results) == optimum
+            continue
+        # Only the change table can have nothing to say about a feasible job
+        if name != "exact_change" and bool(results) != (optimum is not None):
+            failures[name] = f"found {len(results)} combos, reference optimum is {optimum}"
+        elif results and name in FUZZ_OPTIMAL_BACKENDS:
+            if results[0][1] != optimum:
+                failures[name] = f"{results[0][0]} is not the reference optimum of {optimum} packs"
+        elif results:
+            optimal[name] = min(packs for _, packs, _ in results) == optimum
+    return failures, optimal
+
+def _fuzz_case_reductions(case):
+    """Simpler variants of a case, most drastic first"""
+    unit = currency_registry[case["currency"]]["unit"]
+    if case["full_blocks"]:
+        yield {**case, "full_blocks": False}
+    if case["priority_share"]:
+        yield {**case, "priority_share": 0}
+    if case["min_distance"]:
+        yield {**case, "min_distance": 0}
+    for field in ("only", "priority"):
+        for key in case[field]:
+            yield {**case, field: [k for k in case[field] if k != key]}
+    for key, count in case["stock"].items():
+        yield {**case, "stock": {k: v for k, v in case["stock"].items() if k != key}}
+        for smaller in {count // 2, count - 1}:
+            if 0 <= smaller < count:
+                yield {**case, "stock": {**case["stock"], key: smaller}}
+    for smaller in {case["amount"] // 2 // unit * unit, case["amount"] - unit}:
+        if 0 <= smaller < case["amount"]:
+            yield {**case, "amount": smaller}
+
+def shrink_fuzz_case(case, backend):
+    """Simplify a failing case for as long as the backend keeps failing on it"""
+    shrinking = True
+    while shrinking:
+        shrinking = False
+        for candidate in _fuzz_case_reductions(case):
+            if backend in check_fuzz_case(candidate, [backend])[0]:
+                case = candidate
+                shrinking = True
+                break
+    return case
+
+def time_large_stock_jobs(rng, jobs=FUZZ_TIMING_JOBS):
+    """
+    Solve Dollar jobs with 1k-20k packs per denomination and a random Priority
+    selection in both modes. Returns {mode: (slowest seconds, job)}.
+    """
+    slowest = {}
+    for _ in range(jobs):
+        stock = {denom_key("Dollars", value): rng.randint(1000, 20000) for value in currency_denoms["Dollars"]}
+        amount = rng.randint(100, 60000) * 1000
+        priority = rng.sample(list(stock), rng.randint(1, len(stock)))
+        share = rng.choice([0, 0, 25, 50])
+        denominations, max_counts = prepare_search_inputs("Dollars", amount, stock, [], priority)
+        priority_mask = [denom_key("Dollars", d) in priority for d in denominations]
+        for mode in ("greedy", "balanced"):
+            started = time.perf_counter()
+            solve_job(mode, "Dollars", denominations, max_counts, amount, priority_mask=priority_mask,
+                      min_priority_share=share)
+            elapsed = time.perf_counter() - started
+            if elapsed > slowest.get(mode, (0,))[0]:
+                slowest[mode] = (elapsed, {"amount": amount, "stock": stock, "priority": priority,
+                                           "priority_share": share})
+    return slowest
+
+def run_fuzz(cases=2000, seed=None):
+    """Run the differential harness, print a report and return the number of failing cases"""
+    rng = random.Random(seed)
+    backends = ["greedy", "balanced", "exact_change", "solve_job/greedy", "solve_job/balanced"]
+    failures = {}
+    optimal = {}
+    runs = {}
+    failing_cases = 0
+    started = time.perf_counter()
+    for n in range(cases):
+        case = random_fuzz_case(rng)
+        extra = []
+        if n % FUZZ_ANYTIME_EVERY == 0:
+            extra.append("solve_job/anytime")
+        if n % FUZZ_PARALLEL_EVERY == 0 and (os.cpu_count() or 1) > 1:
+            extra.append("parallel")
+        case_failures, case_optimal = check_fuzz_case(case, backends + extra)
+        for name in backends + extra:
+            runs[name] = runs.get(name, 0) + 1
+        for name, reached in case_optimal.items():
+            hits, total = optimal.get(name, (0, 0))
+            optimal[name] = (hits + reached, total + 1)
+        if case_failures:
+            failing_cases += 1
+        for name, message in case_failures.items():
+            failures.setdefault(name, []).append((case, message))
+    elapsed = time.perf_counter() - started
+
+    print(f"{cases} cases in {elapsed:.2f}s ({cases / elapsed:.0f} cases/s), seed {seed}")
+    for name in backends + ["solve_job/anytime", "parallel"]:
+        if name not in runs:
+            print(f"  {name}: not run")
+            continue
+        if name in FUZZ_OPTIMAL_BACKENDS:
+            print(f"  {name}: {runs[name]} cases, {len(failures.get(name, []))} failures")
+            continue
+        hits, total = optimal.get(name, (0, 0))
+        rate = f"{100 * hits / total:.0f}% optimal pack count" if total else "no feasible cases"
+        print(f"  {name}: {runs[name]} cases, {len(failures.get(name, []))} failures, {rate}")
+    for name, found in failures.items():
+        case, message = found[0]
+        minimal = shrink_fuzz_case(case, name)
+        print(f"\n{name} failed on {len(found)} cases: {message}")
+        print(f"  minimal case: {json.dumps(minimal)}")
+        print(f"  {check_fuzz_case(minimal, [name])[0].get(name)}")
+
+    # Branch and bound must stay interactive on realistic stock, not just on the small random cases
+    for mode, (elapsed, job) in time_large_stock_jobs(rng).items():
+        print(f"  large stock priority/{mode}: slowest {elapsed:.2f}s of {FUZZ_TIMING_JOBS} jobs")
+        if elapsed > FUZZ_TIMING_LIMIT:
+            failing_cases += 1
+            print(f"    over the {FUZZ_TIMING_LIMIT:g}s limit: {json.dumps(job)}")
+    return failing_cases
+
+# Inventory forecasting
+# Replays a job stream through the solver with the same debits a confirmed
+# packing makes, to see which denominations run out first, how many jobs
+# fail and how much to restock. Solves are cached: once stock is plentiful
+# the capped max counts stop changing, so repeated amounts are free.
+# python Cash_Delivery_Calculator.py --simulate JOBS [--currency C] [--mode M] [--runs N] [--seed N]
+FORECAST_SAFETY_FACTOR = 1.2  # Restock levels cover the stream's usage plus this margin
+FORECAST_GUI_RUNS = 50  # Monte Carlo runs behind the Forecast button
+
+def load_job_stream(path):
+    """Job amounts from a file: one per line, or a CSV with an 'amount' column"""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    column = 0
+    if rows and "amount" in [cell.strip().lower() for cell in rows[0]]:
+        column = [cell.strip().lower() for cell in rows[0]].index("amount")
+        rows = rows[1:]
+    return [int(float(row[column])) for row in rows if row and row[column].strip()]
+
+@lru_cache(maxsize=65536)
+def _forecast_solve(mode, currency, denominations, max_counts, amount, full_blocks, priority_mask, priority_share):
+    """Best combo the calculator would list first for a job, or None (cached)"""
+    results, _ = solve_job(mode, currency, list(denominations), list(max_counts), amount, full_blocks,
+                           priority_mask=list(priority_mask), min_priority_share=priority_share, parallel=False)
+    return results[0][0] if results else None
+
+def simulate_job_stream(currency, stock, jobs, mode="greedy", full_blocks=False,
+                        only_selected=(), priority_selected=(), priority_share=0):
+    """
+    Solve each job against the remaining stock ({denomination key: packs}) and
+    debit the chosen split. Returns a report with the failed job count, the job
+    index at which each denomination ran out, packs used, and restock levels.
+    """
+    remaining = dict(stock)
+    used = {key: 0 for key in stock}
+    depleted = {}
+    failed = 0
+    shortfall = {}  # Packs the failed jobs would have needed with unlimited stock
+    for index, amount in enumerate(jobs):
+        denominations, max_counts = prepare_search_inputs(currency, amount, remaining,
+                                                          only_selected, priority_selected)
+        priority_mask = tuple(denom_key(currency, d) in priority_selected for d in denominations)
+        combo = _forecast_solve(mode, currency, tuple(denominations), tuple(max_counts), amount,
+                                full_blocks, priority_mask, priority_share) if denominations else None
+        if combo is None:
+            failed += 1
+            change = lookup_change(currency, amount)
+            if change is not None and change[0] is not None:
+                for value, count in zip(currency_denoms[currency], change[1]):
+                    key = denom_key(currency, value)
+                    shortfall[key] = shortfall.get(key, 0) + count
+            continue
+        for value, count in zip(denominations, combo):
+            key = denom_key(currency, value)
+            remaining[key] -= count
+            used[key] += count
+            if remaining[key] == 0 and count and key not in depleted:
+                depleted[key] = index
+
+    restock = {}
+    for key in stock:
+        level = ceil((used[key] + shortfall.get(key, 0)) * FORECAST_SAFETY_FACTOR)
+        restock[key] = max(0, level - stock[key])
+    return {"jobs": len(jobs), "failed": failed, "depleted": depleted, "used": used,
+            "remaining": remaining, "restock": restock}
+
+def _forecast_run(args):
+    """One Monte Carlo run: replay a resampled job stream (process pool worker)"""
+    seed, amounts, length, currency, stock, options = args
+    rng = random.Random(seed)
+    jobs = [rng.choice(amounts) for _ in range(length)]
+    return simulate_job_stream(currency, stock, jobs, **options)
+
+def forecast_monte_carlo(currency, stock, amounts, runs, length=None, seed=0, **options):
+    """
+    Replay runs synthetic streams resampled from amounts, spread over the
+    solver process pool when there is more than one core (each run then
+    solves its jobs serially in its worker). Returns a summary:
+    mean failed jobs, how often and how early each denomination ran out, and
+    the restock level that covers 90% of runs.
+    """
+    length = length or len(amounts)
+    work = [(seed + run, amounts, length, currency, stock, options) for run in range(runs)]
+    if solver_workers() > 1 and runs > 1:
+        reports = list(get_solver_pool().map(_forecast_run, work, chunksize=max(1, runs // (4 * solver_workers()))))
+    else:
+        reports = [_forecast_run(args) for args in work]
+
+    summary = {"runs": runs, "jobs": length,
+               "mean_failed": sum(r["failed"] for r in reports) / runs, "depletion": {}, "restock": {}}
+    for key in stock:
+        indices = sorted(r["depleted"][key] for r in reports if key in r["depleted"])
+        if indices:
+            summary["depletion"][key] = (len(indices) / runs, indices[len(indices) // 2])
+        levels = sorted(r["restock"][key] for r in reports)
+        summary["restock"][key] = levels[min(runs - 1, int(runs * 0.9))]
+    return summary
+
+def format_forecast(currency, report, summary=None):
+    """Readable forecast report"""
+    def label(key):
+        return label_map.get(key, key)
+
+    lines = [f"Replayed {report['jobs']} {currency} jobs: {report['failed']} failed"]
+    if report["depleted"]:
+        lines.append("Ran out (in order):")
+        for key, index in sorted(report["depleted"].items(), key=lambda x: x[1]):
+            lines.append(f"  {label(key)} after job {index + 1}")
+    else:
+        lines.append("No denomination ran out")
+    lines.append("Recommended restock (packs):")
+    for key, count in report["restock"].items():
+        lines.append(f"  {label(key)}: +{count} (used {report['used'][key]}, {report['remaining'][key]} left)")
+    if summary:
+        lines.append("")
+        lines.append(f"Monte Carlo, {summary['runs']} runs of {summary['jobs']} jobs: "
+                     f"{summary['mean_failed']:.1f} failed jobs on average")
+        for key, (rate, median) in sorted(summary["depletion"].items(), key=lambda x: x[1][1]):
+            lines.append(f"  {label(key)} runs out in {rate:.0%} of runs (median: job {median + 1})")
+        for key, count in summary["restock"].items():
+            lines.append(f"  {label(key)}: restock +{count} covers 90% of runs")
+    return "\n".join(lines)
+
+def run_forecast():
+    """Forecast button: replay a job file against the current stock and settings"""
+    path = filedialog.askopenfilename(title="Job stream (one amount per line, or CSV with an amount column)",
+                                      filetypes=[("Job files", "*.csv *.txt"), ("All files", "*.*")])
+    if not path:
+        return
+    try:
+        currency = currency_var.get()
+        jobs = load_job_stream(path)
+        if not jobs:
+            messagebox.showwarning("No Jobs", "The file has no job amounts.")
+            return
+        sync_stock_fields()
+        stock = {}
+        for value in currency_denoms.get(currency, []):
+            key = denom_key(currency, value)
+            count_str = all_denom_vars[key].get().strip()
+            if count_str:
+                stock[key] = int(count_str)
+        options = {
+            "mode": "balanced" if search_mode.get() == "balanced" else "greedy",
+            "full_blocks": full_blocks_only.get(),
+            "only_selected": tuple(key for key, var in only_vars.items() if var.get()),
+            "priority_selected": tuple(key for key, var in priority_vars.items() if var.get()),
+            "priority_share": float(priority_share_var.get() or 0)
+        }
+        report = simulate_job_stream(currency, stock, jobs, **options)
+        summary = forecast_monte_carlo(currency, stock, jobs, FORECAST_GUI_RUNS, **options)
+        messagebox.showinfo("Inventory Forecast", format_forecast(currency, report, summary))
+    except Exception as e:
+        messagebox.showerror("Error", f"Error running forecast: {str(e)}")
+
+# Profiling
+# With "Profile" ticked, one Calculate press runs under cProfile while a
+# background thread samples the main thread's stack. Both are written to
+# profile_dir: a .prof file for pstats/snakeviz and a .collapsed file of
+# folded stacks for flamegraph.pl or speedscope. Unticked, Calculate calls
+# calculate_splits directly. Work done in the solver process pool is not
+# captured, only the wait for it.
+import cProfile
+import threading
+
+profile_dir = "profiles"
+PROFILE_SAMPLE_INTERVAL = 0.001  # Seconds between stack samples
+
+def frame_name(code):
+    """Flame-graph frame label for a code object"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_stacks(thread_id, stacks, stop):
+    """Count the folded stacks of one thread until stop is set"""
+    while not stop.wait(PROFILE_SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        if names:
+            folded = ";".join(reversed(names))
+            stacks[folded] = stacks.get(folded, 0) + 1
+
+def profile_call(func, name="calc"):
+    """
+    Run func under cProfile and the stack sampler and write both profiles.
+    Returns the paths of the .prof and .collapsed files.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    stacks = {}
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_stacks, args=(threading.get_ident(), stacks, stop), daemon=True)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(PROFILE_SAMPLE_INTERVAL / 2)  # Let the sampler in at its own pace
+    profiler = cProfile.Profile()
+    sampler.start()
+    try:
+        profiler.runcall(func)
+    finally:
+        stop.set()
+        sampler.join()
+        sys.setswitchinterval(switch_interval)
+    profiler.dump_stats(base + ".prof")
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        for folded, count in sorted(stacks.items()):
+            f.write(f"{folded} {count}\n")
+    return base + ".prof", base + ".collapsed"
+
+def run_calculation():
+    """Calculate button: plain calculate_splits, or a profiled run when Profile is ticked"""
+    if not profile_var.get():
+        calculate_splits()
+        return
+    try:
+        prof_path, collapsed_path = profile_call(calculate_splits)
+    except Exception as e:
+        messagebox.showerror("Error", f"Error writing profile: {str(e)}")
+        return
+    status = status_var.get()
+    status_var.set((status + "\n" if status else "") + f"Profile written to {prof_path} and {collapsed_path}")
+
 # Memory management functions
-import json
-import os
+import sys
 
 memory_file = "config.json"
 
@@ -842,7 +2550,11 @@ default_memory = {
     "denominations": {},
     "priority": {},
     "only": {},
-    "balanced_mode": False
+    "search_mode": "greedy",
+    "anytime_budget": "2",
+    "priority_share": "",
+    "min_difference": "",
+    "history": {"undo": [], "redo": []}
 }
 
 def load_memory():
@@ -861,7 +2573,11 @@ def save_memory():
         "amount": amount_var.get(),
         "currency": currency_var.get(),
         "container": container_var.get(),
-        "balanced_mode": balanced_mode.get(),
+        "search_mode": search_mode.get(),
+        "anytime_budget": anytime_budget_var.get(),
+        "priority_share": priority_share_var.get(),
+        "min_difference": min_difference_var.get(),
+        "history": inventory_history,
         "denominations": {},
         "priority": {},
         "only": {}
@@ -877,178 +2593,423 @@ def save_memory():
     except Exception:
         pass  # Silently fail if can't save
 
-# GUI setup starts here
-root = tk.Tk()
-root.title("Cash Delivery Calculator")
-root.configure(padx=20, pady=20)
-
-# Initialize dictionaries for only and priority variables
-only_vars = {}
-priority_vars = {}
-
-# Main input section - Row 0
-input_frame = tk.Frame(root)
-input_frame.grid(row=0, column=0, columnspan=12, sticky="ew", pady=(0, 20))
-
-# Job amount input
-tk.Label(input_frame, text="Job Amount:").grid(row=0, column=0, sticky="e", padx=(0, 10))
-amount_var = tk.StringVar()
-tk.Entry(input_frame, textvariable=amount_var, width=15).grid(row=0, column=1, padx=(0, 30))
-
-# Currency selection with radio buttons
-tk.Label(input_frame, text="Currency:").grid(row=0, column=2, sticky="e", padx=(0, 10))
-currency_var = tk.StringVar(value="Dollars")
-currency_radios = []
-
-currency_frame = tk.Frame(input_frame)
-currency_frame.grid(row=0, column=3, columnspan=3, sticky="w")
-
-for i, currency in enumerate(["Dollars", "Euros", "Yen"]):
-    radio = tk.Radiobutton(currency_frame, text=currency, variable=currency_var, value=currency,
-                          font=("Arial", 10), padx=15)
-    radio.grid(row=0, column=i, sticky="w")
-    currency_radios.append(radio)
-
-# Algorithm options - second row
-full_blocks_only = tk.BooleanVar(value=False)
-tk.Checkbutton(input_frame, text="Only allow full blocks (30 packs)", variable=full_blocks_only).grid(row=1, column=0, columnspan=3, sticky="w", pady=(10, 0))
-
-balanced_mode = tk.BooleanVar(value=False)
-tk.Checkbutton(input_frame, text="Smart Balance (prioritize abundant bills)", variable=balanced_mode, 
-               fg="#4CAF50", font=("Arial", 9, "bold")).grid(row=1, column=3, columnspan=4, sticky="w", pady=(10, 0))
-
-# Container selection with grouped buttons - Row 1
-container_var = tk.StringVar(value="Backpack")
-container_section = create_container_selection()
-
-# Denominations section - Row 2
-denom_frame = tk.Frame(root)
-denom_frame.grid(row=2, column=0, columnspan=12, sticky="ew", pady=(0, 20))
-
-# Section header
-tk.Label(denom_frame, text="Enter number of full packs per denomination:", font=("Arial", 10, "bold")).grid(row=0, column=0, columnspan=12, pady=(0, 15), sticky="w")
-
-# Column headers
-headers = ["Dollars", "Euros", "Yen"]
-for i, header in enumerate(headers):
-    tk.Label(denom_frame, text=header, font=("Arial", 9, "bold")).grid(row=1, column=i*3, sticky="w", padx=(0, 10))
-
-# Dollar inputs
-dollar_frame = tk.Frame(denom_frame)
-dollar_frame.grid(row=2, column=0, columnspan=3, sticky="ew", padx=(0, 30))
-
-dollar_denoms = [10000, 5000, 2000, 1000]
-d_vars = [tk.StringVar() for _ in dollar_denoms]
-only_vars.update({str(d): tk.BooleanVar() for d in dollar_denoms})
-priority_vars.update({str(d): tk.BooleanVar() for d in dollar_denoms})
-
-for i, (denom, var) in enumerate(zip(dollar_denoms, d_vars)):
-    tk.Label(dollar_frame, text=label_map[str(denom)]).grid(row=i, column=0, sticky="e", padx=(0, 10))
-    tk.Entry(dollar_frame, textvariable=var, width=8).grid(row=i, column=1, padx=(0, 10))
-    tk.Checkbutton(dollar_frame, text="Only", variable=only_vars[str(denom)]).grid(row=i, column=2, padx=(0, 10))
-    tk.Checkbutton(dollar_frame, text="Priority", variable=priority_vars[str(denom)]).grid(row=i, column=3)
-
-d10k_var, d5k_var, d2k_var, d1k_var = d_vars
-
-# Euro inputs
-euro_frame = tk.Frame(denom_frame)
-euro_frame.grid(row=2, column=3, columnspan=3, sticky="ew", padx=(0, 30))
-
-euro_denoms = [10000, 5000, 2000]
-e_vars = [tk.StringVar() for _ in euro_denoms]
-only_vars.update({f"{d}e": tk.BooleanVar() for d in euro_denoms})
-priority_vars.update({f"{d}e": tk.BooleanVar() for d in euro_denoms})
-
-for i, (denom, var) in enumerate(zip(euro_denoms, e_vars)):
-    tk.Label(euro_frame, text=label_map[f"{denom}e"]).grid(row=i, column=0, sticky="e", padx=(0, 10))
-    tk.Entry(euro_frame, textvariable=var, width=8).grid(row=i, column=1, padx=(0, 10))
-    tk.Checkbutton(euro_frame, text="Only", variable=only_vars[f"{denom}e"]).grid(row=i, column=2, padx=(0, 10))
-    tk.Checkbutton(euro_frame, text="Priority", variable=priority_vars[f"{denom}e"]).grid(row=i, column=3)
-
-e10k_var, e5k_var, e2k_var = e_vars
-
-# Yen inputs
-yen_frame = tk.Frame(denom_frame)
-yen_frame.grid(row=2, column=6, columnspan=3, sticky="ew")
-
-yen_denoms = [1000000, 500000, 100000]
-y_vars = [tk.StringVar() for _ in yen_denoms]
-only_vars.update({str(d): tk.BooleanVar() for d in yen_denoms})
-priority_vars.update({str(d): tk.BooleanVar() for d in yen_denoms})
-
-for i, (denom, var) in enumerate(zip(yen_denoms, y_vars)):
-    tk.Label(yen_frame, text=label_map[str(denom)]).grid(row=i, column=0, sticky="e", padx=(0, 10))
-    tk.Entry(yen_frame, textvariable=var, width=8).grid(row=i, column=1, padx=(0, 10))
-    tk.Checkbutton(yen_frame, text="Only", variable=only_vars[str(denom)]).grid(row=i, column=2, padx=(0, 10))
-    tk.Checkbutton(yen_frame, text="Priority", variable=priority_vars[str(denom)]).grid(row=i, column=3)
-
-y1m_var, y500k_var, y100k_var = y_vars
-
-# Create dictionary of all denomination variables for easy access
-all_denom_vars = {
-    "10000": d10k_var, "5000": d5k_var, "2000": d2k_var, "1000": d1k_var,
-    "10000e": e10k_var, "5000e": e5k_var, "2000e": e2k_var,
-    "1000000": y1m_var, "500000": y500k_var, "100000": y100k_var
-}
+# Reservation store
+# Packs shown in a packing confirmation are held in a shared SQLite file so
+# operators planning from the same config.json can't double-book them. The
+# same file keeps the on-hand stock itself: confirming a plan debits it in
+# the transaction that consumes the holds, so every planner solves against
+# on-hand minus holds rather than their own copy of the counts.
+import socket
+import sqlite3
+import uuid
+
+hold_db_file = "reservations.db"
+HOLD_TTL_SECONDS = 600  # Holds lapse after 10 minutes if never confirmed or cancelled
+planner_id = f"{socket.gethostname()}:{os.getpid()}"
+
+_hold_db = None
+
+def get_hold_store():
+    """Open the reservation database on first use"""
+    global _hold_db
+    if _hold_db is None:
+        # Autocommit mode so every transaction below is explicit and short
+        _hold_db = sqlite3.connect(hold_db_file, timeout=10, isolation_level=None)
+        _hold_db.execute("PRAGMA journal_mode=WAL")  # Readers never wait on a planner writing
+        _hold_db.execute("""CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan TEXT NOT NULL,
+            planner TEXT NOT NULL,
+            denom TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            expires REAL NOT NULL)""")
+        _hold_db.execute("CREATE INDEX IF NOT EXISTS holds_plan ON holds (plan)")
+        _hold_db.execute("""CREATE TABLE IF NOT EXISTS stock (
+            denom TEXT PRIMARY KEY,
+            count INTEGER NOT NULL)""")
+    return _hold_db
+
+def _apply_stock_delta(db, delta):
+    """Add signed changes to the stock rows, never below 0 (call inside a transaction)"""
+    applied = {}
+    for denom, change in delta.items():
+        row = db.execute("SELECT count FROM stock WHERE denom = ?", (denom,)).fetchone()
+        if row is None:
+            continue  # Not stocked at all
+        count = max(0, row[0] + change)
+        if count != row[0]:
+            db.execute("UPDATE stock SET count = ? WHERE denom = ?", (count, denom))
+            applied[denom] = count - row[0]
+    return applied
+
+def stock_on_hand():
+    """Packs per denomination in the shared stock record"""
+    return dict(get_hold_store().execute("SELECT denom, count FROM stock"))
+
+def seed_stock(counts):
+    """Start the shared stock record from these counts if no planner has yet"""
+    db = get_hold_store()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if db.execute("SELECT COUNT(*) FROM stock").fetchone()[0] == 0:
+            db.executemany("INSERT INTO stock (denom, count) VALUES (?, ?)", counts.items())
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+def set_stock(counts):
+    """Record recounted stock ({denomination key: packs, or None when not stocked})"""
+    db = get_hold_store()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        for denom, count in counts.items():
+            if count is None:
+                db.execute("DELETE FROM stock WHERE denom = ?", (denom,))
+            else:
+                db.execute("INSERT OR REPLACE INTO stock (denom, count) VALUES (?, ?)", (denom, count))
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+def adjust_stock(delta):
+    """Apply signed changes to the shared stock in one transaction; returns the change applied"""
+    db = get_hold_store()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        applied = _apply_stock_delta(db, delta)
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    return applied
+
+def _active_holds(db, exclude_planner=None):
+    """Sum of unexpired holds per denomination (call inside a transaction)"""
+    db.execute("DELETE FROM holds WHERE expires < ?", (time.time(),))
+    rows = db.execute("SELECT denom, SUM(count) FROM holds WHERE planner != ? GROUP BY denom",
+                      (exclude_planner or "",))
+    return {denom: total for denom, total in rows}
+
+def held_counts():
+    """Packs per denomination currently held by other planners"""
+    db = get_hold_store()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        held = _active_holds(db, exclude_planner=planner_id)
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    return held
+
+def place_holds(counts, ttl=HOLD_TTL_SECONDS):
+    """
+    Atomically hold packs for a planned split.
+    Returns a plan id, or None if the shared stock minus other planners'
+    holds doesn't cover the split.
+    """
+    db = get_hold_store()
+    plan_id = uuid.uuid4().hex
+    db.execute("BEGIN IMMEDIATE")  # Take the write lock before checking availability
+    try:
+        on_hand = dict(db.execute("SELECT denom, count FROM stock"))
+        held = _active_holds(db, exclude_planner=planner_id)
+        if any(count > on_hand.get(denom, 0) - held.get(denom, 0) for denom, count in counts.items()):
+            db.execute("ROLLBACK")
+            return None
+        expires = time.time() + ttl
+        db.executemany("INSERT INTO holds (plan, planner, denom, count, expires) VALUES (?, ?, ?, ?, ?)",
+                       [(plan_id, planner_id, denom, count, expires) for denom, count in counts.items() if count])
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    return plan_id
 
-# Calculate button - Row 3
-button_frame = tk.Frame(root)
-button_frame.grid(row=3, column=0, columnspan=12, pady=20)
-
-calculate_button = tk.Button(button_frame, text="Think for me", command=calculate_splits, 
-                           font=("Arial", 11, "bold"), bg="#4CAF50", fg="white", 
-                           relief="raised", padx=20, pady=10)
-calculate_button.pack()
-
-# Results table - Row 4
-tree = setup_result_table(root)
-
-# Instruction label - Row 5
-instruction_label = tk.Label(root, text="Select a result and click 'Use Packs' to see packing details and confirm\n*VB = Very Balanced Distribution  *GB = Good Balance", 
-                            font=("Arial", 9), fg="#888888")
-instruction_label.grid(row=5, column=0, columnspan=12, pady=(0, 10))
-
-# Apply result button - Row 6
-apply_button = tk.Button(root, text="Use Packs", command=lambda: on_result_click(None), 
-                        font=("Arial", 10), bg="#2196F3", fg="white", 
-                        relief="raised", padx=15, pady=5)
-apply_button.grid(row=6, column=0, columnspan=12, pady=(0, 10))
-
-# Theme selection - Row 7
-theme_frame = tk.Frame(root)
-theme_frame.grid(row=7, column=0, columnspan=12, pady=(0, 10))
-
-tk.Label(theme_frame, text="Theme:").pack(side="left", padx=(0, 10))
-theme_var = tk.StringVar(value="dark")
-tk.Radiobutton(theme_frame, text="Flashbang", variable=theme_var, value="light", 
-               command=lambda: apply_theme("light")).pack(side="left", padx=(0, 10))
-tk.Radiobutton(theme_frame, text="Dark", variable=theme_var, value="dark", 
-               command=lambda: apply_theme("dark")).pack(side="left")
-
-# Load saved memory and apply settings
-memory = load_memory()
-amount_var.set(memory["amount"])
-currency_var.set(memory["currency"])
-container_var.set(memory["container"])
-balanced_mode.set(memory.get("balanced_mode", False))
-
-# Load denomination values
-for denom_str, value in memory["denominations"].items():
-    if denom_str in all_denom_vars:
-        all_denom_vars[denom_str].set(value)
-
-# Load priority and only settings
-for denom_str, value in memory["priority"].items():
-    if denom_str in priority_vars:
-        priority_vars[denom_str].set(value)
-
-for denom_str, value in memory["only"].items():
-    if denom_str in only_vars:
-        only_vars[denom_str].set(value)
-
-# Initialize container selection and apply theme
-select_container(container_var.get())
-apply_theme("dark")
-
-# Start the GUI main loop
-root.mainloop()
\ No newline at end of file
+def commit_holds(plan_id):
+    """
+    Debit the held packs of a plan from the shared stock and consume the holds,
+    in one transaction. Returns the change applied ({denomination key: -packs}),
+    or None if the holds expired before the plan was confirmed.
+    """
+    db = get_hold_store()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        live = db.execute("SELECT denom, SUM(count) FROM holds WHERE plan = ? AND expires >= ? GROUP BY denom",
+                          (plan_id, time.time())).fetchall()
+        applied = _apply_stock_delta(db, {denom: -count for denom, count in live}) if live else None
+        db.execute("DELETE FROM holds WHERE plan = ?", (plan_id,))
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    return applied
+
+def release_holds(plan_id=None):
+    """Drop the holds of a plan, or every hold this planner owns"""
+    db = get_hold_store()
+    if plan_id is None:
+        db.execute("DELETE FROM holds WHERE planner = ?", (planner_id,))
+    else:
+        db.execute("DELETE FROM holds WHERE plan = ?", (plan_id,))
+
+# The GUI only runs when the script is started directly; solver worker
+# processes import this file without it
+if __name__ == "__main__":
+    # Build the change tables offline and exit: python Cash_Delivery_Calculator.py --build-tables
+    if "--build-tables" in sys.argv:
+        for currency in currency_denoms:
+            build_change_table(currency)
+        sys.exit(0)
+
+    # Run the differential fuzz harness and exit: --fuzz [cases] [--seed N]
+    if "--fuzz" in sys.argv:
+        args = sys.argv[sys.argv.index("--fuzz") + 1:]
+        cases = int(args[0]) if args and args[0].isdigit() else 2000
+        seed = int(args[args.index("--seed") + 1]) if "--seed" in args else None
+        sys.exit(1 if run_fuzz(cases, seed) else 0)
+
+    # Forecast a job stream against the shared stock and exit:
+    # --simulate JOBS [--currency C] [--mode greedy|balanced] [--runs N] [--seed N]
+    if "--simulate" in sys.argv:
+        args = sys.argv[sys.argv.index("--simulate") + 1:]
+        def option(name, default):
+            return args[args.index(name) + 1] if name in args else default
+        memory = load_memory()
+        currency = option("--currency", memory.get("currency", "Dollars"))
+        # Start the shared stock from config.json if it is new, as the GUI does
+        saved = {key: str(value).strip() for key, value in memory["denominations"].items()}
+        seed_stock({key: int(value) for key, value in saved.items() if value.isdigit()})
+        # Packs held by other planners are not available to the forecast either
+        on_hand, held = stock_on_hand(), held_counts()
+        stock = {}
+        for value in currency_denoms[currency]:
+            key = denom_key(currency, value)
+            if key in on_hand:
+                stock[key] = max(0, on_hand[key] - held.get(key, 0))
+        jobs = load_job_stream(args[0])
+        mode = option("--mode", "greedy")
+        started = time.perf_counter()
+        report = simulate_job_stream(currency, stock, jobs, mode)
+        runs = int(option("--runs", 0))
+        summary = forecast_monte_carlo(currency, stock, jobs, runs, seed=int(option("--seed", 0)), mode=mode) if runs else None
+        print(format_forecast(currency, report, summary))
+        print(f"({time.perf_counter() - started:.2f}s)")
+        shutdown_solver_pool()
+        sys.exit(0)
+
+    # GUI setup starts here
+    # Time-to-first-frame budget for the main window. Importing this module (everything before
+    # this point) takes about 80 ms; the remaining ~220 ms covers Tk start-up, widget
+    # construction and the first paint, which have not been measured against a real display
+    STARTUP_TARGET_MS = 300
+
+    root = tk.Tk()
+    root.title("Cash Delivery Calculator")
+    root.configure(padx=20, pady=20)
+
+    # Configure the named styles before any widget exists so the first frame is already themed
+    theme_var = tk.StringVar(value="dark")
+    apply_theme(theme_var.get())
+
+    # Initialize dictionaries for only and priority variables
+    only_vars = {}
+    priority_vars = {}
+
+    # Main input section - Row 0
+    input_frame = ttk.Frame(root)
+    input_frame.grid(row=0, column=0, columnspan=12, sticky="ew", pady=(0, 20))
+
+    # Job amount input
+    ttk.Label(input_frame, text="Job Amount:").grid(row=0, column=0, sticky="e", padx=(0, 10))
+    amount_var = tk.StringVar()
+    ttk.Entry(input_frame, textvariable=amount_var, width=15).grid(row=0, column=1, padx=(0, 30))
+
+    # Currency selection with radio buttons
+    ttk.Label(input_frame, text="Currency:").grid(row=0, column=2, sticky="e", padx=(0, 10))
+    currency_var = tk.StringVar(value="Dollars")
+    currency_radios = []
+
+    currency_frame = ttk.Frame(input_frame)
+    currency_frame.grid(row=0, column=3, columnspan=3, sticky="w")
+
+    for i, currency in enumerate(currency_registry):
+        radio = ttk.Radiobutton(currency_frame, text=currency, variable=currency_var, value=currency,
+                               style="Currency.TRadiobutton")
+        radio.grid(row=0, column=i, sticky="w")
+        currency_radios.append(radio)
+
+    # Algorithm options - second row
+    full_blocks_only = tk.BooleanVar(value=False)
+    ttk.Checkbutton(input_frame, text="Only allow full blocks (30 packs)", variable=full_blocks_only).grid(row=1, column=0, columnspan=3, sticky="w", pady=(10, 0))
+
+    # Search mode: fewest packs, smart balance, or time-bounded anytime search for very large stock
+    search_mode = tk.StringVar(value="greedy")
+    mode_frame = ttk.Frame(input_frame)
+    mode_frame.grid(row=1, column=3, columnspan=4, sticky="w", pady=(10, 0))
+    ttk.Radiobutton(mode_frame, text="Fewest Packs", variable=search_mode, value="greedy").pack(side="left", padx=(0, 10))
+    ttk.Radiobutton(mode_frame, text="Smart Balance (prioritize abundant bills)", variable=search_mode, value="balanced",
+                    style="Accent.TRadiobutton").pack(side="left", padx=(0, 10))
+    ttk.Radiobutton(mode_frame, text="Anytime", variable=search_mode, value="anytime").pack(side="left")
+    anytime_budget_var = tk.StringVar(value="2")
+    ttk.Entry(mode_frame, textvariable=anytime_budget_var, width=4).pack(side="left", padx=(5, 2))
+    ttk.Label(mode_frame, text="s").pack(side="left")
+
+    # Diverse results: listed splits differ by at least this many packs (blank = off)
+    ttk.Label(mode_frame, text="Results differ by").pack(side="left", padx=(15, 0))
+    min_difference_var = tk.StringVar()
+    ttk.Entry(mode_frame, textvariable=min_difference_var, width=4).pack(side="left", padx=(5, 2))
+    ttk.Label(mode_frame, text="packs").pack(side="left")
+
+    # Container selection with grouped buttons - Row 1
+    container_var = tk.StringVar(value="Backpack")
+    container_section = create_container_selection()
+
+    # Denominations section - Row 2
+    denom_frame = ttk.Frame(root)
+    denom_frame.grid(row=2, column=0, columnspan=12, sticky="ew", pady=(0, 20))
+
+    # Section header
+    ttk.Label(denom_frame, text="Enter number of full packs per denomination:", style="Header.TLabel").grid(row=0, column=0, columnspan=12, pady=(0, 15), sticky="w")
+
+    # Priority constraint (below the currency panel): minimum share of the job paid in priority denominations
+    priority_share_frame = ttk.Frame(denom_frame)
+    priority_share_frame.grid(row=2, column=0, columnspan=12, sticky="w", pady=(10, 0))
+    ttk.Label(priority_share_frame, text="Priority bills pay at least").pack(side="left")
+    priority_share_var = tk.StringVar()
+    ttk.Entry(priority_share_frame, textvariable=priority_share_var, width=4).pack(side="left", padx=5)
+    ttk.Label(priority_share_frame, text="% of the job").pack(side="left")
+
+    # Denomination variables exist for every currency up front (the solver and
+    # config.json use them), but entry widgets are only built for the currency on screen
+    currency_inputs = {}
+    all_denom_vars = {}
+    for currency, info in currency_registry.items():
+        keys = [info["keys"][value] for value in info["denominations"]]
+        currency_inputs[currency] = [(key, tk.StringVar()) for key in keys]
+        all_denom_vars.update(currency_inputs[currency])
+        only_vars.update({key: tk.BooleanVar() for key in keys})
+        priority_vars.update({key: tk.BooleanVar() for key in keys})
+    currency_panels = {}
+
+    # Calculate button - Row 3
+    button_frame = ttk.Frame(root)
+    button_frame.grid(row=3, column=0, columnspan=12, pady=20)
+
+    calculate_button = ttk.Button(button_frame, text="Think for me", command=run_calculation, 
+                                 style="Calculate.TButton")
+    calculate_button.pack()
+
+    # Search status (e.g. the anytime solver's gap to the lower bound)
+    ttk.Button(button_frame, text="Compare Containers", command=show_comparison).pack(pady=(5, 0))
+
+    # Profile the next calculations (see run_calculation)
+    profile_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(button_frame, text="Profile", variable=profile_var).pack(pady=(5, 0))
+
+    status_var = tk.StringVar()
+    ttk.Label(button_frame, textvariable=status_var, style="Hint.TLabel").pack(pady=(5, 0))
+
+    # Results table - Row 4
+    tree = setup_result_table(root)
+
+    # Instruction label - Row 5
+    instruction_label = ttk.Label(root, text="Select a result (Ctrl/Shift-click for a batch of jobs) and click 'Use Packs' to see packing details and confirm\n*VB = Very Balanced Distribution  *GB = Good Balance", 
+                                 style="Hint.TLabel")
+    instruction_label.grid(row=5, column=0, columnspan=12, pady=(0, 10))
+
+    # Apply result button - Row 6
+    apply_button = ttk.Button(root, text="Use Packs", command=lambda: on_result_click(None), 
+                             style="Apply.TButton")
+    apply_button.grid(row=6, column=0, columnspan=12, pady=(0, 10))
+
+    # Export results button - Row 6 (beside Use Packs)
+    ttk.Button(root, text="Export Results", command=export_results).grid(row=6, column=10, columnspan=2, sticky="e", pady=(0, 10))
+
+    # Forecast button - Row 6 (left of Use Packs)
+    ttk.Button(root, text="Forecast...", command=run_forecast).grid(row=6, column=0, columnspan=2, sticky="w", pady=(0, 10))
+
+    # Undo/redo of confirmed packings - Row 7 (left of the theme choice)
+    history_frame = ttk.Frame(root)
+    history_frame.grid(row=7, column=0, columnspan=3, sticky="w", pady=(0, 10))
+    undo_button = ttk.Button(history_frame, text="Undo", command=undo_inventory)
+    undo_button.pack(side="left", padx=(0, 5))
+    redo_button = ttk.Button(history_frame, text="Redo", command=redo_inventory)
+    redo_button.pack(side="left")
+    root.bind("<Control-z>", undo_inventory)
+    root.bind("<Control-y>", redo_inventory)
+
+    # Theme selection - Row 7
+    theme_frame = ttk.Frame(root)
+    theme_frame.grid(row=7, column=0, columnspan=12, pady=(0, 10))
+
+    ttk.Label(theme_frame, text="Theme:").pack(side="left", padx=(0, 10))
+    ttk.Radiobutton(theme_frame, text="Flashbang", variable=theme_var, value="light", 
+                    command=lambda: apply_theme("light")).pack(side="left", padx=(0, 10))
+    ttk.Radiobutton(theme_frame, text="Dark", variable=theme_var, value="dark", 
+                    command=lambda: apply_theme("dark")).pack(side="left")
+
+    # Load saved memory and apply settings
+    memory = load_memory()
+    amount_var.set(memory["amount"])
+    # A currency removed from the catalog falls back to the first one
+    currency_var.set(memory["currency"] if memory["currency"] in currency_registry else next(iter(currency_registry)))
+    container_var.set(memory["container"])
+    # Older configs only stored the Smart Balance checkbox
+    search_mode.set(memory.get("search_mode", "balanced" if memory.get("balanced_mode") else "greedy"))
+    anytime_budget_var.set(memory.get("anytime_budget", "2"))
+    priority_share_var.set(memory.get("priority_share", ""))
+    min_difference_var.set(memory.get("min_difference", ""))
+
+    # Load denomination values
+    for denom_str, value in memory["denominations"].items():
+        if denom_str in all_denom_vars:
+            all_denom_vars[denom_str].set(value)
+    # Other planners may have packed since config.json was saved
+    load_shared_stock()
+
+    # Load priority and only settings
+    for denom_str, value in memory["priority"].items():
+        if denom_str in priority_vars:
+            priority_vars[denom_str].set(value)
+
+    for denom_str, value in memory["only"].items():
+        if denom_str in only_vars:
+            only_vars[denom_str].set(value)
+
+    # Load the undo/redo history, dropping steps for denominations that no longer exist
+    for stack in ("undo", "redo"):
+        inventory_history[stack] = [step for step in memory.get("history", {}).get(stack, [])
+                                    if all(denom_str in all_denom_vars for denom_str in step["delta"])]
+    update_history_buttons()
+
+    # Build the active currency's panel now and the others when first selected
+    currency_var.trace_add("write", show_currency_panel)
+    show_currency_panel()
+
+    # Initialize container selection
+    select_container(container_var.get())
+
+    def report_first_frame(event):
+        """Report time to first frame when over budget or when asked with --startup-time"""
+        # The root's bindings also fire for its children, so wait for the window itself
+        if event.widget is not root:
+            return
+        root.unbind("<Expose>", first_frame_binding)
+        # Flush the pending redraws so the measurement covers the painted frame
+        root.update_idletasks()
+        elapsed_ms = (time.perf_counter() - startup_started) * 1000
+        if elapsed_ms > STARTUP_TARGET_MS or "--startup-time" in sys.argv:
+            print(f"Time to first frame: {elapsed_ms:.0f} ms (target {STARTUP_TARGET_MS} ms)")
+
+    # after_idle runs before the window is mapped, so measure on its first Expose instead
+    first_frame_binding = root.bind("<Expose>", report_first_frame)
+
+    # Start the GUI main loop
+    root.mainloop()
+
+    # Don't leave holds behind for other operators when the window closes
+    release_holds()
+    shutdown_solver_pool()